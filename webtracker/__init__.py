@@ -1,8 +1,15 @@
-from .graph import Graph
 from .download import Download
 from .session import Session
 from .overlap import Overlap
 from .log import Log
+from .logtable import LogTable
 from .user import User
 
-__all__ = ["Graph", "Download", "Session", "Overlap", "Log", "User"]
+__all__ = ["Graph", "Download", "Session", "Overlap", "Log", "LogTable", "User"]
+
+def __getattr__(name):
+    # Graph pulls in dash, plotly and pandas, so it is only imported when first asked for.
+    if "Graph" == name:
+        from .graph import Graph
+        return Graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
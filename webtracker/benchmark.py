@@ -0,0 +1,418 @@
+from argparse import SUPPRESS, ArgumentParser
+import contextlib
+import copy
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from download import Download
+from intervals import DownloadIndex
+from log import Log, session_hash
+from profiler import format_delta, format_max, get_max_rss_mb, get_rss_mb, round_mb
+from sweep import find_overlap_groups
+from loggen import add_generator_args, get_generator_kwargs, write_log
+from totals import PartialTotals, Totals
+from webtracker import expand_log_paths, export_data, group_user_sessions, parse_logs, summarize_users
+
+# Modules that must only be imported when a dashboard or a DataFrame/Parquet export is requested.
+HEAVY_MODULES = ("dash", "pandas", "plotly", "pyarrow")
+
+SUITE_SIZES = [10000, 1000000, 10000000]
+# A stage regresses when it is this much slower (or grows RSS this much more) than the baseline.
+REGRESSION_TOLERANCE = 1.25
+# Stages faster than this, or growing RSS by less than this, are too noisy to compare.
+MIN_COMPARED_SECONDS = 0.05
+MIN_COMPARED_MB = 10
+# Randomized download sets the overlap engine is checked on, besides the users of the real logs.
+RANDOM_TRIALS = 2000
+RANDOM_MAX_DLOADS = 40
+
+def best_time(func, repeat):
+    """Returns the fastest of `repeat` wall-clock timings of func() in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def group_by_key(logs):
+    sessions = {}
+    for log in logs:
+        sessions.setdefault(log.session_key, []).append(log)
+    return sessions
+
+def group_by_md5(logs):
+    sessions = {}
+    for log in logs:
+        sessions.setdefault(session_hash(log.userid, log.url, log.tabid), []).append(log)
+    return sessions
+
+def legacy_overlap_groups(dloads):
+    """Reference copy of the original User.get_overlaps state machine, kept to check the sweep engine against."""
+    groups = []
+    idx = 0
+    prev_overlaps = {}
+    total_overlaps = {}
+
+    try:
+        starting_dload = dloads[idx]
+        ending_dload = dloads[idx]
+        greatest_end = starting_dload.end
+
+        while True:
+
+            try:
+                curr_overlaps = {}
+
+                for dload in dloads[idx +1:]:
+                    if starting_dload.start < dload.start <= ending_dload.end:
+                        curr_overlaps[dload] = dload.end
+
+                if 2 > len(prev_overlaps) and 2 > len(curr_overlaps): # No previous and no current
+                    if idx == len(dloads) - 1:
+                        break
+                    else: # idx != len(dloads) - 1:
+                        idx += 1
+                        starting_dload = dloads[idx]
+                        ending_dload = dloads[idx]
+
+                elif 2 > len(prev_overlaps) and 2 <= len(curr_overlaps): # No previous but current
+                    greatest_end = max(curr_overlaps.values())
+                    i = len(list(curr_overlaps.values())) - list(curr_overlaps.values())[::-1].index(greatest_end) - 1 # last occurence of max value
+                    target_dload = list(curr_overlaps.keys())[i]
+
+                    if idx == len(dloads) - 1:
+                        groups.append((starting_dload, list(total_overlaps.keys()), target_dload))
+                        break
+                    else: # idx != len(dloads) - 1:
+                        for dload in curr_overlaps:
+                            if dload not in total_overlaps:
+                                total_overlaps[dload] = dload.end
+                        idx += 1
+                        ending_dload = dloads[idx]
+
+                elif 2 <= len(prev_overlaps) and 2 > len(curr_overlaps): # Previous but no current
+                    greatest_end = max(total_overlaps.values())
+                    i = len(list(total_overlaps.values())) - list(total_overlaps.values())[::-1].index(greatest_end) - 1
+                    target_dload = list(total_overlaps.keys())[i]
+                    groups.append((starting_dload, list(total_overlaps.keys()), target_dload))
+
+                    if idx == len(dloads) - 1:
+                        break
+                    else: # idx != len(dloads) - 1:
+                        total_overlaps.clear()
+                        idx += 1
+                        starting_dload = dloads[idx]
+
+                elif 2 <= len(prev_overlaps) and 2 <= len(curr_overlaps): # Both previous and current:
+                    greatest_end = max(total_overlaps.values())
+                    i = len(list(total_overlaps.values())) - list(total_overlaps.values())[::-1].index(greatest_end) - 1 # last occurence of max value
+                    target_dload = list(total_overlaps.keys())[i]
+
+                    if idx == len(dloads) - 1:
+                        groups.append((starting_dload, list(total_overlaps.keys()), target_dload))
+                        break
+                    else: # idx != len(dloads) - 1:
+                        for dload in curr_overlaps:
+                            if dload not in total_overlaps:
+                                total_overlaps[dload] = dload.end
+                        idx += 1
+                        ending_dload = dloads[idx]
+
+                prev_overlaps = copy.deepcopy(curr_overlaps)
+
+            except IndexError:
+                break
+    except IndexError:
+        pass
+    return groups
+
+def bench_overlaps(filenames, repeat):
+    """Checks find_overlap_groups against the original implementation for every user and compares their timings."""
+    mismatches = 0
+    sweep_time = legacy_time = 0
+    num_users = num_overlaps = 0
+    for filename in filenames:
+        for user in group_user_sessions(parse_logs(filename)):
+            user.get_dloads()
+            expected = legacy_overlap_groups(user.dloads)
+            if expected != find_overlap_groups(user.dloads):
+                mismatches += 1
+                print(f"  MISMATCH: user {user.id} in {filename}")
+            num_users += 1
+            num_overlaps += len(expected)
+            sweep_time += best_time(lambda: find_overlap_groups(user.dloads), repeat)
+            legacy_time += best_time(lambda: legacy_overlap_groups(user.dloads), repeat)
+    print(f"{num_users} users, {num_overlaps} overlaps from {len(filenames)} file(s)")
+    print(f"  sweep engine:    {sweep_time:.4f}s")
+    print(f"  original engine: {legacy_time:.4f}s")
+    print(f"  mismatching users: {mismatches}")
+    return mismatches
+
+def get_random_dloads(rng):
+    """Returns a random user's downloads, sorted by (end, start) like User.dloads.
+
+    Starts are drawn from a span between a few and thousands of milliseconds per download, so most sets are dense
+    with concurrent downloads and share start and end timestamps; durations include zero.
+    """
+    num_dloads = rng.randint(1, RANDOM_MAX_DLOADS)
+    span = num_dloads * rng.choice((2, 50, 5000))
+    dloads = []
+    for idx in range(num_dloads):
+        start = rng.randint(0, span)
+        end = start + rng.choice((0, rng.randint(1, 100), rng.randint(1, span)))
+        url = f"url{rng.randrange(4)}"
+        tabid = rng.randrange(3)
+        dloads.append(Download(None, url, idx, Log((start, "user", tabid, url, 1)), Log((end, "user", tabid, url, 2))))
+    return sorted(dloads, key=lambda val: (val.end, val.start))
+
+def bench_random_overlaps(num_trials, seed):
+    """Checks find_overlap_groups against the original implementation on num_trials seeded random download sets."""
+    rng = random.Random(seed)
+    mismatches = num_overlaps = 0
+    for trial in range(num_trials):
+        dloads = get_random_dloads(rng)
+        expected = legacy_overlap_groups(dloads)
+        if expected != find_overlap_groups(dloads) or expected != find_overlap_groups(dloads, DownloadIndex(dloads)):
+            mismatches += 1
+            print(f"  MISMATCH: random trial {trial} (seed {seed}, {len(dloads)} downloads)")
+        num_overlaps += len(expected)
+    print(f"{num_trials} random download sets, {num_overlaps} overlaps (seed {seed})")
+    print(f"  mismatching sets: {mismatches}")
+    return mismatches
+
+def scan_in_flight(dloads, start, end):
+    """Returns the downloads intersecting [start, end] by walking every download, as queries did before DownloadIndex."""
+    return [dload for dload in sorted(dloads, key=lambda val: val.start) if dload.start <= end and start <= dload.end]
+
+def scan_max_concurrency(dloads, start, end):
+    """Returns (count, timestamp) of DownloadIndex.get_max_concurrency by counting at the range start and at every start."""
+    best, best_time = 0, None
+    for timestamp in sorted(set([start] + [dload.start for dload in dloads if start < dload.start <= end])):
+        count = len(scan_in_flight(dloads, timestamp, timestamp))
+        if best < count:
+            best, best_time = count, timestamp
+    return best, best_time
+
+def bench_intervals(filenames, repeat, num_queries=200):
+    """Checks DownloadIndex range, stabbing and max-concurrency queries against full scans of the downloads,
+    per user and over all users, and compares their timings."""
+    mismatches = 0
+    index_time = scan_time = 0
+    indexes = []
+    for filename in filenames:
+        users = group_user_sessions(parse_logs(filename))
+        indexes.extend((user.id, user.dloads) for user in users)
+        indexes.append((filename, [dload for user in users for dload in user.dloads]))
+    for name, dloads in indexes:
+        if not dloads:
+            continue
+        index = DownloadIndex(dloads)
+        first, last = index.starts[0], index.ends[-1]
+        step = max(1, (last - first) // num_queries)
+        queries = [(timestamp, timestamp + step * 3) for timestamp in range(first - step, last + step, step)]
+        for start, end in queries:
+            if ([id(dload) for dload in index.get_range(start, end)] != [id(dload) for dload in scan_in_flight(dloads, start, end)]
+                    or index.count_at(start) != len(scan_in_flight(dloads, start, start))
+                    or index.get_max_concurrency(start, end) != scan_max_concurrency(dloads, start, end)):
+                mismatches += 1
+                print(f"  MISMATCH: {name} [{start}, {end}]")
+                break
+        index_time += best_time(lambda: [(index.get_range(start, end), index.count_at(start)) for start, end in queries], repeat)
+        scan_time += best_time(lambda: [(scan_in_flight(dloads, start, end), len(scan_in_flight(dloads, start, start))) for start, end in queries], repeat)
+    print(f"{len(indexes)} download indexes from {len(filenames)} file(s)")
+    print(f"  DownloadIndex range + stabbing queries: {index_time:.4f}s")
+    print(f"  full scans:                             {scan_time:.4f}s")
+    print(f"  mismatching indexes: {mismatches}")
+    return mismatches
+
+def bench_session_grouping(filename, repeat):
+    """Compares grouping logs by their tuple session key against hashing every log with MD5."""
+    parse_time = best_time(lambda: parse_logs(filename), repeat)
+    logs = parse_logs(filename)
+    by_key = best_time(lambda: group_by_key(logs), repeat)
+    by_md5 = best_time(lambda: group_by_md5(logs), repeat)
+    print(f"{len(logs)} logs from {filename}")
+    print(f"  parse_logs:                 {parse_time:.4f}s ({len(logs) / parse_time:,.0f} logs/s)")
+    print(f"  parse + group by key:       {parse_time + by_key:.4f}s ({len(logs) / (parse_time + by_key):,.0f} logs/s)")
+    print(f"  parse + group by md5 (old): {parse_time + by_md5:.4f}s ({len(logs) / (parse_time + by_md5):,.0f} logs/s)")
+    print(f"  grouping speedup:           {by_md5 / by_key:.2f}x")
+
+def get_import_times(module):
+    """Returns {module: cumulative import time in seconds} from `python -X importtime -c "import module"`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+def bench_startup(repeat):
+    """Times importing the CLI module and checks it does not pull in the visualization and dataframe stack."""
+    import_time = min(get_import_times("webtracker")["webtracker"] for _ in range(repeat))
+    times = get_import_times("webtracker")
+    heavy = [name for name in times if name.split(".")[0] in HEAVY_MODULES]
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "webtracker.py", "-h"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, check=True)
+    help_time = time.perf_counter() - start
+    slowest = sorted(((cumulative, name) for name, cumulative in times.items() if "." not in name and "webtracker" != name), reverse=True)[:5]
+    print("Startup")
+    print(f"  import webtracker:   {import_time:.4f}s")
+    print(f"  webtracker.py -h:    {help_time:.4f}s")
+    print(f"  slowest imports:     {', '.join(f'{name} {cumulative:.3f}s' for cumulative, name in slowest)}")
+    print(f"  heavy modules:       {', '.join(sorted(set(name.split('.')[0] for name in heavy))) or 'none'}")
+    return len(heavy)
+
+def run_pipeline(filename):
+    """Times every pipeline stage on one log file and returns {lines, max_rss_mb, stages: {stage: {seconds,
+    lines_per_sec, rss_delta_mb}}}.
+
+    ru_maxrss is a high-water mark for the whole process, so each stage records the change in current RSS over it
+    instead, and the file gets the peak. Run once per file in a fresh process (see run_suite), so that peak belongs
+    to that file alone.
+    """
+    with open(filename, 'rb') as fp:
+        num_lines = sum(1 for _ in fp)
+    stages = {}
+    def run_stage(name, func):
+        start_rss = get_rss_mb()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        end_rss = get_rss_mb()
+        stages[name] = {"seconds" : round(seconds, 4), "lines_per_sec" : round(num_lines / seconds) if seconds else None,
+            "rss_delta_mb" : None if start_rss is None or end_rss is None else round(end_rss - start_rss, 1)}
+        return result
+
+    logs = run_stage("parse_logs", lambda: parse_logs(filename))
+    users = run_stage("group_user_sessions", lambda: group_user_sessions(logs))
+    del logs
+    summaries = run_stage("generate_user_info", lambda: summarize_users(users))
+    del users
+    totals = run_stage("totals", lambda: get_totals(summaries))
+    with tempfile.TemporaryDirectory() as export_dir:
+        run_stage("export", lambda: export_data(summaries, totals, export_dir, "csv"))
+    return {"lines" : num_lines, "max_rss_mb" : round_mb(get_max_rss_mb()), "stages" : stages}
+
+def get_totals(summaries):
+    totals = Totals.from_partials([PartialTotals.from_users(summaries)])
+    totals.get_totals()
+    return totals
+
+def get_suite_log(data_dir, num_lines, generator_kwargs):
+    """Returns the synthetic log of num_lines for these generator settings, writing it on first use."""
+    key = "-".join(f"{value}" for value in generator_kwargs.values())
+    filename = os.path.join(data_dir, f"synthetic-{num_lines}-{key}.log")
+    if not os.path.exists(filename):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {filename}")
+        write_log(f"{filename}.tmp", num_lines, **generator_kwargs)
+        os.replace(f"{filename}.tmp", filename)
+    return filename
+
+def is_larger(value_mb, base_mb):
+    return value_mb is not None and base_mb is not None and MIN_COMPARED_MB < value_mb and base_mb * REGRESSION_TOLERANCE < value_mb
+
+def get_regressions(results, baseline):
+    """Returns a message for every stage slower or larger than its baseline by more than REGRESSION_TOLERANCE."""
+    regressions = []
+    for size, result in results["sizes"].items():
+        base_result = baseline.get("sizes", {}).get(size, {})
+        if is_larger(result["max_rss_mb"], base_result.get("max_rss_mb")):
+            regressions.append(f"{size} lines: {result['max_rss_mb']:.0f}MB vs {base_result['max_rss_mb']:.0f}MB max RSS")
+        base_stages = base_result.get("stages", {})
+        for name, stage in result["stages"].items():
+            base = base_stages.get(name)
+            if base is None:
+                continue
+            if MIN_COMPARED_SECONDS < stage["seconds"] and base["seconds"] * REGRESSION_TOLERANCE < stage["seconds"]:
+                regressions.append(f"{size} lines, {name}: {stage['seconds']:.3f}s vs {base['seconds']:.3f}s")
+            if is_larger(stage["rss_delta_mb"], base.get("rss_delta_mb")):
+                regressions.append(f"{size} lines, {name}: {stage['rss_delta_mb']:+.0f}MB vs {base['rss_delta_mb']:+.0f}MB RSS")
+    return regressions
+
+def run_suite(sizes, data_dir, generator_kwargs, baseline_path, save_baseline):
+    """Runs the pipeline on synthetic logs of each size and checks the results against the JSON baseline."""
+    results = {"generator" : generator_kwargs, "sizes" : {}}
+    for num_lines in sizes:
+        filename = get_suite_log(data_dir, num_lines, generator_kwargs)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--pipeline", filename], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+        result = results["sizes"][str(num_lines)] = json.loads(output)
+        print(f"{result['lines']} lines, {format_max(result['max_rss_mb'])} max RSS")
+        for name, stage in result["stages"].items():
+            print(f"  {name:<20} {stage['seconds']:>9.3f}s {stage['lines_per_sec'] or 0:>12,} lines/s {format_delta(stage['rss_delta_mb']):>12} RSS")
+
+    if save_baseline:
+        with open(baseline_path, 'w') as fp:
+            json.dump(results, fp, indent=2)
+            fp.write("\n")
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; rerun with --save-baseline to record one")
+        return 0
+    with open(baseline_path) as fp:
+        baseline = json.load(fp)
+    if baseline.get("generator") != generator_kwargs:
+        print("Baseline was recorded with other generator settings; not compared")
+        return 0
+    regressions = get_regressions(results, baseline)
+    for regression in regressions:
+        print(f"  REGRESSION: {regression}")
+    return len(regressions)
+
+def handle_args():
+    parser = ArgumentParser(description='Benchmark the log parsing pipeline')
+    parser.add_argument("-l", "--log", dest="filename", default="../10000log.txt",
+                    help="input log file", metavar="FILE")
+    parser.add_argument("-o", "--overlap-logs", dest="overlap_filenames", nargs='+', default=["../Data1", "../10000log.txt"],
+                    help="log files, directories or globs to check the overlap engine on", metavar="FILE")
+    parser.add_argument("--random-trials", dest="random_trials", type=int, default=RANDOM_TRIALS,
+                    help=f"random download sets to check the overlap engine on, seeded with --seed (default: {RANDOM_TRIALS})", metavar="N")
+    parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=5,
+                    help="number of timing runs per stage")
+    parser.add_argument("--suite", dest="suite", action="store_true",
+                    help="time every pipeline stage on synthetic logs and compare against the baseline")
+    parser.add_argument("-n", "--sizes", dest="sizes", type=int, nargs='+', default=SUITE_SIZES,
+                    help="suite log sizes in lines (default: 10000 1000000 10000000)", metavar="N")
+    parser.add_argument("--data-dir", dest="data_dir", default=os.path.join(tempfile.gettempdir(), "webtracker-bench"),
+                    help="directory the synthetic logs are generated in and reused from", metavar="DIR")
+    parser.add_argument("-b", "--baseline", dest="baseline", default="benchmark_baseline.json",
+                    help="JSON baseline of the suite (default: benchmark_baseline.json)", metavar="FILE")
+    parser.add_argument("--save-baseline", dest="save_baseline", action="store_true",
+                    help="record the suite results as the new baseline instead of comparing")
+    parser.add_argument("--pipeline", dest="pipeline", default=None, help=SUPPRESS)
+    add_generator_args(parser)
+    args = parser.parse_args()
+    args.overlap_filenames = expand_log_paths(args.overlap_filenames)
+    return args
+
+def main() -> int:
+    args = handle_args()
+    if args.pipeline:
+        # generate_user_info prints every overlap; keep stdout for the JSON result.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = run_pipeline(args.pipeline)
+        print(json.dumps(result))
+        return 0
+    if args.suite:
+        if run_suite(args.sizes, args.data_dir, get_generator_kwargs(args), args.baseline, args.save_baseline):
+            return 1
+        return 0
+    heavy = bench_startup(args.repeat)
+    bench_session_grouping(args.filename, args.repeat)
+    mismatches = bench_overlaps(args.overlap_filenames, args.repeat) + bench_random_overlaps(args.random_trials, args.seed)
+    if mismatches + bench_intervals(args.overlap_filenames, args.repeat) or heavy:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
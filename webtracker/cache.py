@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+from log import Log
+from logtable import LogTable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMNS = ("timestamp", "userid", "tabid", "url", "status")
+# Rows converted from the memory-mapped columns to Python values at a time.
+CHUNK_SIZE = 65536
+
+class LogCache():
+    """On-disk columnar cache of parsed log files.
+
+    Each source file gets a directory of .npy columns (the LogTable columns) plus a meta.json holding the interned
+    userid and url names and the source path, size and mtime it was parsed from. Columns are memory-mapped on load,
+    so a cached file is never regex-parsed again; the entry is rebuilt as soon as the source file changes.
+    Caching is skipped when NumPy is not installed.
+    """
+
+    def __init__(self, cache_dir, rebuild=False):
+        self._cache_dir = cache_dir
+        self._rebuild = rebuild
+
+    def get_entry_path(self, filename):
+        """Returns the cache directory of a source file, keyed on its absolute path."""
+        key = hashlib.md5(os.path.abspath(filename).encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_dir, key)
+
+    def get_source_key(self, filename):
+        stat = os.stat(filename)
+        return {"path" : os.path.abspath(filename), "size" : stat.st_size, "mtime_ns" : stat.st_mtime_ns}
+
+    def load(self, filename):
+        """Returns the memory-mapped columns and names cached for filename, or None if missing or stale."""
+        if np is None or self._rebuild:
+            return None
+        entry_path = self.get_entry_path(filename)
+        try:
+            with open(os.path.join(entry_path, "meta.json")) as fp:
+                meta = json.load(fp)
+            if meta["source"] != self.get_source_key(filename):
+                return None
+            columns = {column : np.load(os.path.join(entry_path, f"{column}.npy"), mmap_mode='r') for column in COLUMNS}
+        except (OSError, ValueError, KeyError):
+            return None
+        return columns, meta["userid_names"], meta["url_names"]
+
+    def save(self, filename, table):
+        """Writes the columns of a LogTable parsed from filename, replacing any previous entry."""
+        if np is None:
+            return
+        source = self.get_source_key(filename)
+        entry_path = self.get_entry_path(filename)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column, values in table.to_numpy().items():
+            np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as fp:
+            json.dump({"source" : source, "userid_names" : table.userid_names, "url_names" : table.url_names}, fp)
+        shutil.rmtree(entry_path, ignore_errors=True)
+        os.replace(tmp_path, entry_path)
+
+    def iter_logs(self, filename, parse):
+        """Yields the Log objects of filename from the cache, or from parse(filename) while filling the cache."""
+        cached = self.load(filename)
+        if cached is None:
+            table = LogTable.from_logs(parse(filename))
+            self.save(filename, table)
+            yield from table
+            return
+        columns, userid_names, url_names = cached
+        # Converting one chunk at a time keeps only that slice of the mapped columns resident.
+        for first in range(0, len(columns["timestamp"]), CHUNK_SIZE):
+            chunk = (columns[column][first:first + CHUNK_SIZE].tolist() for column in COLUMNS)
+            for timestamp, userid, tabid, url, status in zip(*chunk):
+                yield Log((timestamp, userid_names[userid], tabid, url_names[url], status))
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+    @property
+    def rebuild(self):
+        return self._rebuild
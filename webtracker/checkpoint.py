@@ -0,0 +1,100 @@
+import os
+import pickle
+from logtable import LogTable
+from totals import PartialTotals
+
+class Checkpoint():
+    """State carried between incremental runs, kept in a local pickle file.
+
+    It records how far each input file has been read, the logs of users that are still open (their downloads may
+    still overlap with new ones) and the summary of every user, keyed by userid in order of first appearance. Users
+    idle for longer than the idle timeout are closed: they are no longer re-analysed, and their logs are kept as a
+    compact LogTable. A closed user who comes back is reopened with those logs and analysed as a whole again, so the
+    summaries match a full run over the same logs.
+
+    Keeping whole histories is deliberate: a session is every log of a (url, tab) ever seen, its downloads are the
+    status 1/2 pairs of consecutive logs in timestamp order, and its duration and average download time span all of
+    them. Appended logs are not always later than the saved ones (several files, late beacons), so a new log can
+    split an old download pair, extend any session and regroup overlaps, and nothing short of the logs keeps the
+    results exact. The cost of a run therefore grows with the history of the users it touches, not just the tail.
+    """
+
+    def __init__(self, path, idle_timeout):
+        self._path = path
+        self._idle_timeout = idle_timeout
+        self._files = {}
+        self._open_logs = {}
+        self._closed_logs = {}
+        self._last_seen = {}
+        self._summaries = {}
+        self._latest = None
+
+    @classmethod
+    def load(cls, path, idle_timeout):
+        """Returns the checkpoint stored at path, or an empty one if there is none yet."""
+        if not os.path.exists(path):
+            return cls(path, idle_timeout)
+        with open(path, 'rb') as fp:
+            checkpoint = pickle.load(fp)
+        checkpoint._path = path
+        checkpoint._idle_timeout = idle_timeout
+        return checkpoint
+
+    def save(self):
+        """Writes the checkpoint atomically so an interrupted run leaves the previous state intact."""
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, 'wb') as fp:
+            pickle.dump(self, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path)
+
+    def get_offset(self, filename):
+        """Returns the byte offset to resume filename from; 0 if it is new, was rotated or was truncated."""
+        stat = os.stat(filename)
+        try:
+            dev, ino, offset = self._files[os.path.abspath(filename)]
+        except KeyError:
+            return 0
+        if (dev, ino) != (stat.st_dev, stat.st_ino) or stat.st_size < offset:
+            return 0
+        return offset
+
+    def set_offset(self, filename, offset):
+        stat = os.stat(filename)
+        self._files[os.path.abspath(filename)] = (stat.st_dev, stat.st_ino, offset)
+
+    def add_logs(self, logs):
+        """Adds newly read logs to their users' open state, reopening closed users, and returns every open log of
+        the users they touch."""
+        touched = {}
+        for log in logs:
+            if log.userid in self._closed_logs:
+                self._open_logs[log.userid] = list(self._closed_logs.pop(log.userid))
+            self._summaries.setdefault(log.userid, None)
+            self._open_logs.setdefault(log.userid, []).append(log)
+            self._last_seen[log.userid] = max(log.timestamp, self._last_seen.get(log.userid, log.timestamp))
+            if self._latest is None or self._latest < log.timestamp:
+                self._latest = log.timestamp
+            touched[log.userid] = None
+        return [log for userid in touched for log in self._open_logs[userid]]
+
+    def update_summaries(self, summaries):
+        """Replaces the summaries of re-analysed users and closes the users idle for longer than the idle timeout."""
+        for summary in summaries:
+            self._summaries[summary.id] = summary
+        if self._latest is None:
+            return
+        horizon = self._latest - self._idle_timeout
+        for userid in [userid for userid, last_seen in self._last_seen.items() if last_seen < horizon]:
+            self._closed_logs[userid] = LogTable.from_logs(self._open_logs.pop(userid))
+            del self._last_seen[userid]
+
+    def get_partial_totals(self):
+        """Returns the PartialTotals of every user, in order of first appearance like a full run."""
+        return PartialTotals.from_users(self.summaries)
+
+    @property
+    def summaries(self):
+        return list(self._summaries.values())
+    @property
+    def num_open_users(self):
+        return len(self._open_logs)
@@ -0,0 +1,45 @@
+from dash import Input, Output, dcc, html
+
+class Dashboard():
+    """One multi-page Dash app whose pages are built on their first view and memoized.
+
+    Each page is registered with a function returning its children, so startup only lays out the navigation and
+    registers callbacks; no frame or figure is built until a page is opened.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._pages = {}
+        self._titles = {}
+        self._layouts = {}
+
+    def add_page(self, path, title, build_page):
+        self._pages[path] = build_page
+        self._titles[path] = title
+
+    def get_page(self, pathname):
+        """Returns the memoized layout of a page, building it on first view. Unknown paths show the first page."""
+        if pathname not in self._pages:
+            pathname = next(iter(self._pages))
+        if pathname not in self._layouts:
+            self._layouts[pathname] = html.Div([html.H2(self._titles[pathname]), *self._pages[pathname]()])
+        return self._layouts[pathname]
+
+    def init_app(self):
+        self._app.config.suppress_callback_exceptions = True
+        self._app.layout = html.Div([
+            dcc.Location(id='page-location'),
+            html.Div([dcc.Link(title, href=path, style={"margin-right" : "1em"}) for path, title in self._titles.items()]),
+            html.Div(id='page-content'),
+        ])
+
+        @self._app.callback(Output('page-content', 'children'), Input('page-location', 'pathname'))
+        def display_page(pathname):
+            return self.get_page(pathname)
+
+    @property
+    def app(self):
+        return self._app
+    @property
+    def layouts(self):
+        return self._layouts
@@ -25,7 +25,7 @@ class Download():
 
     @property
     def session(self):
-        return self.session
+        return self._session
     @property
     def url(self):
         return self._url  
@@ -46,4 +46,6 @@ class Download():
         return self._end
     @property
     def duration(self):
+        if self._duration is None:
+            self.get_duration()
         return self._duration
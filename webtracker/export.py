@@ -0,0 +1,75 @@
+import csv
+from itertools import islice
+
+BATCH_SIZE = 10000
+
+# Arrow type of every numeric field of the exported tables; any other field is written as a string.
+PARQUET_TYPES = {
+    'num_logs' : "int64", 'num_sessions' : "int64", 'num_dloads' : "int64", 'num_urls_visited' : "int64",
+    'num_overlaps' : "int64", 'num_times_dloaded' : "int64",
+    'browsing_time (hrs)' : "float64", 'avg_session_time (hrs)' : "float64", 'percent_dloads' : "float64",
+    'percent_overlaps' : "float64", 'avg_overlap_duration (secs)' : "float64", 'avg_time_between_overlaps (mins)' : "float64",
+    'avg_num_urls_per_overlap' : "float64", 'avg_dload_time (secs)' : "float64", 'dload_duration (secs)' : "float64",
+    'overlap_duration (secs)' : "float64", 'time_before_overlap_starts (secs)' : "float64", 'num_urls_per_overlap' : "float64",
+    'avg_time_before_overlap_starts (secs)' : "float64", 'avg_num_urls_per_overlaps' : "float64",
+}
+
+def iter_batches(rows, batch_size=BATCH_SIZE):
+    """Yields lists of at most batch_size rows so a row generator is never materialized whole."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def write_csv(path, fields, rows, batch_size=BATCH_SIZE):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for batch in iter_batches(rows, batch_size):
+            writer.writerows(batch)
+
+def get_parquet_schema(fields):
+    """Returns the pyarrow schema of an exported table from the known type of each of its fields."""
+    import pyarrow as pa
+    return pa.schema([pa.field(field, getattr(pa, PARQUET_TYPES.get(field, "string"))()) for field in fields])
+
+def write_parquet(path, fields, rows, batch_size=BATCH_SIZE):
+    """Writes rows as Parquet row groups of batch_size rows. Requires pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow")
+    # The schema is fixed up front rather than inferred, since a column can be all None or all whole numbers in one
+    # batch and hold floats in the next.
+    schema = get_parquet_schema(fields)
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_batches(rows, batch_size):
+            writer.write_table(pa.Table.from_pylist([dict(zip(fields, row)) for row in batch], schema=schema))
+
+def write_rows(path, fields, rows, batch_size=BATCH_SIZE):
+    """Streams rows (sequences in field order) to path, as Parquet if it ends in .parquet and as CSV otherwise."""
+    if path.endswith(".parquet"):
+        write_parquet(path, fields, rows, batch_size)
+    else:
+        write_csv(path, fields, rows, batch_size)
+
+def select_columns(fields, rows, columns):
+    """Returns the fields at the given indices and a generator of the rows cut down to them."""
+    if len(columns) == len(fields):
+        return fields, rows
+    return [fields[idx] for idx in columns], (tuple(row[idx] for idx in columns) for row in rows)
+
+def build_frame(fields, rows):
+    """Returns a DataFrame built straight from the rows, without a CSV round-trip."""
+    import pandas as pd
+    return pd.DataFrame.from_records(rows, columns=fields)
+
+def write_frame(path, frame):
+    """Writes a DataFrame once, as Parquet if path ends in .parquet and as CSV otherwise."""
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
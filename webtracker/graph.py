@@ -1,83 +1,172 @@
-import csv
-import pandas as pd
+import math
+import numpy as np
 import plotly.express as px
-from dash import Dash, dcc, html
-from tqdm import tqdm
+import plotly.graph_objects as go
+from dash import Dash, Input, Output, dash_table, dcc, html
+from export import build_frame, write_frame
+
+HISTOGRAM_BINS = 30
+TOP_N = 20
+PERCENTILES = (50, 90, 99)
+PAGE_SIZE = 25
+
+def get_histogram(values, bins=HISTOGRAM_BINS):
+    """Returns the bin counts and edges of the non-missing values, so the figure carries bins rather than rows."""
+    values = values.dropna().to_numpy(dtype=float)
+    if 0 == len(values):
+        return np.zeros(0, dtype=int), np.zeros(0)
+    return np.histogram(values, bins=bins)
+
+def get_top_n(df, label, metric, n=TOP_N):
+    return df.nlargest(n, metric)[[label, metric]]
+
+def get_percentiles(df, metrics, percentiles=PERCENTILES):
+    """Returns one row per metric with its count, mean, percentiles and maximum."""
+    rows = []
+    for metric in metrics:
+        values = df[metric].dropna().to_numpy(dtype=float)
+        row = {"metric" : metric, "count" : len(values)}
+        if len(values):
+            row["mean"] = round(float(values.mean()), 4)
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+                row[f"p{percentile}"] = round(float(value), 4)
+            row["max"] = round(float(values.max()), 4)
+        rows.append(row)
+    return rows
 
 class Graph():
     """Creates data visualizations."""
 
-    def __init__(self, objs, fields, rows, csvfile, app):
-        self._objs = objs
-        self._fields = fields
-        self._rows = rows
-        self._csvfile = csvfile
+    def __init__(self, df, app, name="graph"):
+        self._df = df
+        self._rows = None
+        self._name = name
+        self._fields = list(df.columns) if df is not None else []
         self._app = app
-        self._df = None
         self._figlst = []
         self._children = []
 
+    @classmethod
+    def from_rows(cls, fields, rows, app, name="graph"):
+        """Builds the DataFrame straight from the metric rows, on first use of df."""
+        graph = cls(None, app, name)
+        graph._fields = list(fields)
+        graph._rows = rows
+        return graph
 
-    def create_format1_csv(self):
-        with open(self._csvfile, 'w') as f:
-            writer = csv.DictWriter(f, fieldnames = self._fields)
-            writer.writeheader() 
-            writer.writerows(self._rows)
-
-    def create_format2_csv(self):
-        with open(self._csvfile, 'w') as f:
-            writer = csv.writer(f)
-            writer.writerow(self._fields)
-            for k,v in self._rows.items():
-                writer.writerow([k, *v])
-
-    def create_format3_csv(self):
-        with open(self._csvfile, 'w') as f:
-            writer = csv.writer(f)
-            writer.writerow(self._fields)
-            writer.writerow(self._rows)
-
-    def get_df(self):
-        self._df = pd.read_csv(self._csvfile)
+    def save(self, path):
+        """Writes the in-memory frame once, as CSV or Parquet depending on the extension of path."""
+        write_frame(path, self.df)
 
     def create_json(self):
         pass
 
 
     def get_user_graphs(self):
-        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self._df, x='user', y=f'{self._fields[1]}', title ="Number of logs per user."))))
-        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self._df, x='user', y=f'{self._fields[2]}', title ="Browsing time per user (hours)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self._df, x='user', y=f'{self._fields[3]}', title ="Number of sessions per user\n(where one session == a group of logs with the same URL and TabID)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self._df, x='user', y=f'{self._fields[4]}', title ="Average session time per user (hours)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph6', figure= px.bar(self._df, x='user', y=f'{self._fields[5]}', title ="Number of downloads per user."))))
-        self._children.append(html.Div(dcc.Graph(id='graph7', figure= px.pie(self._df, names='user', values=f'{self._fields[6]}', title ="Percent of user logs that consist of a download."))))
-        self._children.append(html.Div(dcc.Graph(id='graph8', figure= px.bar(self._df, x='user', y=f'{self._fields[7]}', title ="Number of URLs visited per user."))))
-        self._children.append(html.Div(dcc.Graph(id='graph9', figure= px.bar(self._df, x='user', y=f'{self._fields[8]}', title ="Number of overlaps per user."))))
-        self._children.append(html.Div(dcc.Graph(id='graph10', figure= px.pie(self._df, names='user', values=f'{self._fields[9]}', title ="Percent of user logs that involve an overlap."))))
-        self._children.append(html.Div(dcc.Graph(id='graph11', figure= px.bar(self._df, x='user', y=f'{self._fields[10]}', title ="Average overlap duration per user (seconds)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph12', figure= px.bar(self._df, x='user', y=f'{self._fields[11]}', title ="Average time between overlaps per user."))))
-        self._children.append(html.Div(dcc.Graph(id='graph13', figure= px.bar(self._df, x='user', y=f'{self._fields[12]}', title ="Average number of URLs per overlap per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self.df, x='user', y=f'{self._fields[1]}', title ="Number of logs per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self.df, x='user', y=f'{self._fields[2]}', title ="Browsing time per user (hours)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self.df, x='user', y=f'{self._fields[3]}', title ="Number of sessions per user\n(where one session == a group of logs with the same URL and TabID)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self.df, x='user', y=f'{self._fields[4]}', title ="Average session time per user (hours)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph6', figure= px.bar(self.df, x='user', y=f'{self._fields[5]}', title ="Number of downloads per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph7', figure= px.pie(self.df, names='user', values=f'{self._fields[6]}', title ="Percent of user logs that consist of a download."))))
+        self._children.append(html.Div(dcc.Graph(id='graph8', figure= px.bar(self.df, x='user', y=f'{self._fields[7]}', title ="Number of URLs visited per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph9', figure= px.bar(self.df, x='user', y=f'{self._fields[8]}', title ="Number of overlaps per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph10', figure= px.pie(self.df, names='user', values=f'{self._fields[9]}', title ="Percent of user logs that involve an overlap."))))
+        self._children.append(html.Div(dcc.Graph(id='graph11', figure= px.bar(self.df, x='user', y=f'{self._fields[10]}', title ="Average overlap duration per user (seconds)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph12', figure= px.bar(self.df, x='user', y=f'{self._fields[11]}', title ="Average time between overlaps per user."))))
+        self._children.append(html.Div(dcc.Graph(id='graph13', figure= px.bar(self.df, x='user', y=f'{self._fields[12]}', title ="Average number of URLs per overlap per user."))))
             
     def get_url_graphs(self):
-        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self._df, x='url', y=f'num_times_dloaded', title ="Number successful downloads per URL."))))
-        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self._df, x='url', y=f'avg_dload_time (secs)', title ="Average download time per URL (seconds)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self._df, x='url', y=f'involved_in_an_overlap', title ="URL is involved in an overlap."))))
-        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self._df, x='url', y=f'begins_an_overlap', title ="URL begins an overlap."))))
+        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self.df, x='url', y=f'num_times_dloaded', title ="Number successful downloads per URL."))))
+        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self.df, x='url', y=f'avg_dload_time (secs)', title ="Average download time per URL (seconds)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self.df, x='url', y=f'involved_in_an_overlap', title ="URL is involved in an overlap."))))
+        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self.df, x='url', y=f'begins_an_overlap', title ="URL begins an overlap."))))
 
     def get_overlap_graphs(self):
-        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self._df, x='user_for_this_overlap', y=f'{self._fields[1]}', title ="Overlap duration."))))
-        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self._df, x='user_for_this_overlap', y=f'{self._fields[2]}', title ="Time before overlap starts (seconds)."))))
-        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self._df, x='user_for_this_overlap', y=f'{self._fields[3]}', title ="URL that begins the overlap"))))
-        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self._df, x='user_for_this_overlap', y=f'{self._fields[4]}', title ="Number of URLs per overlap"))))
+        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self.df, x='user_for_this_overlap', y=f'{self._fields[1]}', title ="Overlap duration."))))
+        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self.df, x='user_for_this_overlap', y=f'{self._fields[2]}', title ="Time before overlap starts (seconds)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph3', figure= px.bar(self.df, x='user_for_this_overlap', y=f'{self._fields[3]}', title ="URL that begins the overlap"))))
+        self._children.append(html.Div(dcc.Graph(id='graph4', figure= px.bar(self.df, x='user_for_this_overlap', y=f'{self._fields[4]}', title ="Number of URLs per overlap"))))
 
     def get_dload_graphs(self):
-        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self._df, x='url', y=f'{self._fields[1]}', title ="User of the download."))))
-        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self._df, x='url', y=f'{self._fields[2]}', title ="Download duration (secs)."))))
+        self._children.append(html.Div(dcc.Graph(id='graph1', figure= px.bar(self.df, x='url', y=f'{self._fields[1]}', title ="User of the download."))))
+        self._children.append(html.Div(dcc.Graph(id='graph2', figure= px.bar(self.df, x='url', y=f'{self._fields[2]}', title ="Download duration (secs)."))))
 
     def get_visualized_overlaps(self):
-        #self._children.append(html.Div(dcc.Graph(id='graph22', figure= px.bar(self._df, x='user', y=f'{self._fields[21]}', title ="Overlaps in visualized form."))))
+        #self._children.append(html.Div(dcc.Graph(id='graph22', figure= px.bar(self.df, x='user', y=f'{self._fields[21]}', title ="Overlaps in visualized form."))))
         pass
 
+    def get_aggregated_graphs(self):
+        """Adds percentiles of every numeric column, and a histogram and top-N chart of the selected one.
+
+        Everything is computed server-side, so the page carries a fixed number of bins and bars however many rows
+        the frame has. The charts are only built, by the callbacks of init_callbacks, for the metric picked in the dropdown.
+        """
+        metrics = list(self.df.select_dtypes("number").columns)
+        if not metrics:
+            return
+        self._children.append(html.Div(dash_table.DataTable(id=f'{self._name}-percentiles',
+            columns=[{"name" : column, "id" : column} for column in ["metric", "count", "mean", *(f"p{p}" for p in PERCENTILES), "max"]],
+            data=get_percentiles(self.df, metrics))))
+        self._children.append(html.Div(dcc.Dropdown(id=f'{self._name}-metric', options=metrics, value=metrics[0], clearable=False)))
+        self._children.append(html.Div(dcc.Graph(id=f'{self._name}-histogram')))
+        self._children.append(html.Div(dcc.Graph(id=f'{self._name}-top')))
+
+    def get_detail_table(self):
+        """Adds a table of the rows, filtered, sorted and paged server-side by the callbacks of init_callbacks."""
+        label = self._fields[0]
+        self._children.append(html.Div(dcc.Input(id=f'{self._name}-filter', type='text', debounce=True, placeholder=f"filter by {label}")))
+        self._children.append(html.Div(dash_table.DataTable(id=f'{self._name}-detail',
+            columns=[{"name" : field, "id" : field} for field in self._fields],
+            page_current=0, page_size=PAGE_SIZE, page_action='custom', sort_action='custom', sort_mode='single', sort_by=[])))
+
+    def get_summary_table(self):
+        """Adds the whole frame as one table, for frames of a few rows."""
+        self._children.append(html.Div(dash_table.DataTable(id=f'{self._name}-summary',
+            columns=[{"name" : field, "id" : field} for field in self._fields], data=self.df.to_dict('records'))))
+
+    def init_callbacks(self):
+        """Registers the callbacks of the aggregated graphs and the detail table.
+
+        They only touch df when they fire, so they can be registered at startup for pages that are built later.
+        """
+        label = self._fields[0]
+
+        @self._app.callback(Output(f'{self._name}-histogram', 'figure'), Output(f'{self._name}-top', 'figure'),
+            Input(f'{self._name}-metric', 'value'))
+        def update_metric(metric):
+            counts, edges = get_histogram(self.df[metric])
+            histogram = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+            histogram.update_layout(title=f"Distribution of {metric}.", xaxis_title=metric, yaxis_title=f"number of {label}s")
+            top = get_top_n(self.df, label, metric)
+            top_figure = px.bar(top, x=label, y=metric, title=f"Top {len(top)} {label}s by {metric}.")
+            return histogram, top_figure
+
+        @self._app.callback(Output(f'{self._name}-detail', 'data'), Output(f'{self._name}-detail', 'page_count'),
+            Input(f'{self._name}-detail', 'page_current'), Input(f'{self._name}-detail', 'page_size'),
+            Input(f'{self._name}-detail', 'sort_by'), Input(f'{self._name}-filter', 'value'))
+        def update_detail(page_current, page_size, sort_by, value):
+            df = self.df
+            if value:
+                df = df[df[label].astype(str).str.contains(value, regex=False)]
+            if sort_by:
+                df = df.sort_values(sort_by[0]['column_id'], ascending='asc' == sort_by[0]['direction'])
+            start = page_current * page_size
+            return df.iloc[start : start + page_size].to_dict('records'), max(1, math.ceil(len(df) / page_size))
+
     def init_app(self):
         self._app.layout = html.Div(self._children)
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = build_frame(self._fields, self._rows)
+            self._rows = None
+        return self._df
+    @property
+    def name(self):
+        return self._name
+    @property
+    def children(self):
+        return self._children
     
@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+
+class DownloadIndex():
+    """Sorted-endpoint index over the [start, end] intervals of downloads, for range, stabbing and concurrency queries.
+
+    Intervals are closed, as in Download.__contains__: a download is in flight from its start to its end inclusive.
+    Starts are kept in start order and ends on their own, so counting the downloads in flight at a time is two
+    bisections. A download intersecting [start, end] must start within the longest duration before `start`, so a
+    range query only scans the downloads starting in that bounded window. Works on Download and DownloadSummary.
+    """
+
+    def __init__(self, dloads):
+        self._dloads = list(dloads)
+        self._order = sorted(range(len(self._dloads)), key=lambda idx: self._dloads[idx].start)
+        self._starts = [self._dloads[idx].start for idx in self._order]
+        self._ends = sorted(dload.end for dload in self._dloads)
+        self._max_duration = max((dload.end - dload.start for dload in self._dloads), default=0)
+
+    def __len__(self):
+        return len(self._dloads)
+
+    @classmethod
+    def from_users(cls, users):
+        """Returns the global index over the downloads of every User or UserSummary."""
+        return cls(dload for user in users for dload in user.dloads)
+
+    def count_at(self, timestamp):
+        """Returns how many downloads are in flight at timestamp."""
+        return bisect_right(self._starts, timestamp) - bisect_left(self._ends, timestamp)
+
+    def get_at(self, timestamp):
+        """Returns the downloads in flight at timestamp, in start order."""
+        return self.get_range(timestamp, timestamp)
+
+    def get_range(self, start, end):
+        """Returns the downloads whose interval intersects [start, end], in start order."""
+        lo = bisect_left(self._starts, start - self._max_duration)
+        hi = bisect_right(self._starts, end)
+        return [dload for dload in (self._dloads[idx] for idx in self._order[lo:hi]) if start <= dload.end]
+
+    def get_max_concurrency(self, start=None, end=None):
+        """Returns (count, timestamp): the most downloads in flight at once within [start, end] (the whole index by
+        default) and the first time that many are. Returns (0, None) when no download is in flight in the range."""
+        if not self._dloads:
+            return 0, None
+        if start is None:
+            start = self._starts[0]
+        if end is None:
+            end = self._ends[-1]
+        count = best = self.count_at(start)
+        best_time = start if best else None
+        # Starts after `start` raise the count; ends before `end` lower it just after their timestamp, so at equal
+        # timestamps every start is counted before any end.
+        starts = self._starts[bisect_right(self._starts, start):bisect_right(self._starts, end)]
+        ends = self._ends[bisect_left(self._ends, start):bisect_left(self._ends, end)]
+        idx = 0
+        for timestamp in starts:
+            while idx < len(ends) and ends[idx] < timestamp:
+                count -= 1
+                idx += 1
+            count += 1
+            if best < count:
+                best, best_time = count, timestamp
+        return best, best_time
+
+    @property
+    def dloads(self):
+        return self._dloads
+    @property
+    def order(self):
+        """Indices into dloads in start order (ties keep their order in dloads)."""
+        return self._order
+    @property
+    def starts(self):
+        return self._starts
+    @property
+    def ends(self):
+        return self._ends
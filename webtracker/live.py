@@ -0,0 +1,193 @@
+from collections import Counter, deque
+import heapq
+import itertools
+import os
+from download import Download
+from overlap import Overlap
+from sweep import find_overlap_groups
+
+class LogFollower():
+    """Follows a log file like `tail -F`: returns complete new lines and reopens the file when it is rotated or truncated."""
+
+    def __init__(self, filename, from_start=False):
+        self._filename = filename
+        # Only a file already there when following begins has old lines to skip; one that appears later is new.
+        self._from_start = from_start or not os.path.exists(filename)
+        self._fp = None
+        self._file_id = None
+        self._buffer = ""
+
+    def _open(self):
+        try:
+            self._fp = open(self._filename, 'r', errors='replace')
+        except FileNotFoundError:
+            return
+        stat = os.fstat(self._fp.fileno())
+        self._file_id = (stat.st_dev, stat.st_ino)
+        if not self._from_start:
+            self._fp.seek(0, os.SEEK_END)
+        # Every file that appears after the first one is a rotation and is read from its beginning.
+        self._from_start = True
+
+    def _read(self):
+        data = self._buffer + self._fp.read()
+        lines = data.split("\n")
+        self._buffer = lines.pop()
+        return lines
+
+    def read_lines(self):
+        """Returns the complete lines appended since the last call."""
+        if self._fp is None:
+            self._open()
+            if self._fp is None:
+                return []
+        lines = self._read()
+        try:
+            stat = os.stat(self._filename)
+        except FileNotFoundError:
+            return lines
+        if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._fp.tell():
+            lines.extend(self._read())
+            self._fp.close()
+            self._fp = None
+            self._buffer = ""
+        return lines
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+
+# Milliseconds a log may arrive after a later-stamped one and still be paired in timestamp order.
+REORDER_WINDOW = 10000
+
+class LiveTracker():
+    """Tracks sessions, downloads and overlaps from a live stream of logs over a sliding time window.
+
+    Beacons do not always arrive in timestamp order, so logs are held in a buffer ordered by timestamp (then
+    arrival) until they are more than reorder_window older than the newest log, and only then paired: a download is
+    a status 1 log followed by a status 2 log of the same session, as in the batch pipeline. A log arriving later than
+    that is paired with whatever its session has released so far and counted as late.
+    Overlaps are found with the same sweep as the batch pipeline, over the downloads that ended inside the window.
+    Memory stays bounded: downloads leave with the window, and sessions and users are evicted once idle for longer
+    than idle_timeout. All times are log timestamps in milliseconds.
+    """
+
+    def __init__(self, window, idle_timeout, reorder_window=REORDER_WINDOW):
+        self._window = window
+        self._idle_timeout = idle_timeout
+        self._reorder_window = reorder_window
+        self._now = None
+        self._pending = []
+        self._arrivals = itertools.count()
+        self._released = None
+        self._last_logs = {}
+        self._user_dloads = {}
+        self._user_seen = {}
+        self._num_logs = 0
+        self._num_late_logs = 0
+
+    def add_log(self, log):
+        """Buffers one log and releases, in timestamp order, the logs that have left the reorder window."""
+        if self._now is None or self._now < log.timestamp:
+            self._now = log.timestamp
+        self._num_logs += 1
+        if self._released is not None and log.timestamp < self._released:
+            self._num_late_logs += 1
+        heapq.heappush(self._pending, (log.timestamp, next(self._arrivals), log))
+        self.release(self._now - self._reorder_window)
+
+    def release(self, until=None):
+        """Pairs the buffered logs up to timestamp until (all of them by default) in timestamp order."""
+        while self._pending and (until is None or self._pending[0][0] <= until):
+            timestamp, _, log = heapq.heappop(self._pending)
+            if self._released is None or self._released < timestamp:
+                self._released = timestamp
+            self._pair_log(log)
+
+    def _pair_log(self, log):
+        """Feeds one log into its open session, closing a download when a status 2 log follows a status 1 log."""
+        prev_log = self._last_logs.get(log.session_key)
+        if prev_log is not None and 1 == prev_log.status and 2 == log.status:
+            dload = Download(None, log.url, log.session_key, prev_log, log)
+            dload.get_duration()
+            self._user_dloads.setdefault(log.userid, deque()).append(dload)
+        self._last_logs[log.session_key] = log
+        self._user_seen[log.userid] = log.timestamp
+
+    def evict(self):
+        """Drops downloads that left the window and sessions and users that have been idle too long."""
+        if self._now is None:
+            return
+        window_start = self._now - self._window
+        idle_horizon = self._now - self._idle_timeout
+        for dloads in self._user_dloads.values():
+            while dloads and dloads[0].end < window_start:
+                dloads.popleft()
+        for session_key in [key for key, log in self._last_logs.items() if log.timestamp < idle_horizon]:
+            del self._last_logs[session_key]
+        for userid in [userid for userid, seen in self._user_seen.items() if seen < idle_horizon]:
+            del self._user_seen[userid]
+            if not self._user_dloads.get(userid):
+                self._user_dloads.pop(userid, None)
+        for userid in [userid for userid, dloads in self._user_dloads.items() if not dloads]:
+            del self._user_dloads[userid]
+
+    def get_overlaps(self, userid):
+        """Returns the Overlap objects among the user's downloads that ended inside the window."""
+        dloads = sorted(self._user_dloads.get(userid, ()), key=lambda val: (val.end, val.start))
+        overlaps = []
+        for start, overlapping_starts, end in find_overlap_groups(dloads):
+            overlap = Overlap(userid, start, overlapping_starts, end)
+            overlap.get_metrics()
+            overlaps.append(overlap)
+        return overlaps
+
+    def get_report(self):
+        """Returns per-user and global download and overlap metrics for the current window."""
+        self.evict()
+        user_rows = []
+        overlapping_urls = Counter()
+        num_dloads = num_overlaps = duration_sum = num_urls_sum = 0
+        for userid, dloads in self._user_dloads.items():
+            overlaps = self.get_overlaps(userid)
+            user_duration = sum(overlap.duration for overlap in overlaps)
+            user_rows.append({
+                "user" : userid,
+                "num_dloads" : len(dloads),
+                "num_overlaps" : len(overlaps),
+                "avg_overlap_duration" : user_duration / len(overlaps) if overlaps else None,
+            })
+            num_dloads += len(dloads)
+            num_overlaps += len(overlaps)
+            duration_sum += user_duration
+            num_urls_sum += sum(overlap.num_urls for overlap in overlaps)
+            overlapping_urls.update(overlap.overlapping_url for overlap in overlaps)
+        return {
+            "window_end" : self._now,
+            "window_start" : self._now - self._window if self._now is not None else None,
+            "num_logs" : self._num_logs,
+            "num_late_logs" : self._num_late_logs,
+            "open_sessions" : len(self._last_logs),
+            "active_users" : len(self._user_seen),
+            "num_dloads" : num_dloads,
+            "num_overlaps" : num_overlaps,
+            "avg_overlap_duration" : duration_sum / num_overlaps if num_overlaps else None,
+            "avg_num_urls_per_overlap" : num_urls_sum / num_overlaps if num_overlaps else None,
+            "most_common_url_that_begins_an_overlap" : overlapping_urls.most_common(1)[0][0] if overlapping_urls else None,
+            "users" : sorted(user_rows, key=lambda row: row["num_overlaps"], reverse=True),
+        }
+
+    @property
+    def now(self):
+        return self._now
+    @property
+    def num_logs(self):
+        return self._num_logs
+    @property
+    def num_late_logs(self):
+        return self._num_late_logs
+    @property
+    def reorder_window(self):
+        return self._reorder_window
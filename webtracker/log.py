@@ -1,20 +1,48 @@
 import hashlib
+import re
+import sys
+
+# /WebTracker/<timestamp>:<userid>:<tabid>:<url>:<status>, as requested by the browser extension.
+WEBTRACKER_PATH_RE = re.compile(r"/WebTracker/(\d+):([^:\s]*):(\d+):([^:\s]*):(\d+)")
+# The same request as it appears in an access log line.
+WEBTRACKER_RE = re.compile(WEBTRACKER_PATH_RE.pattern + " HTTP")
+WEBTRACKER_BYTES_RE = re.compile(WEBTRACKER_RE.pattern.encode())
+
+def parse_log_line(line:str):
+    """Returns the Log object of an access log line, or None if it is not a WebTracker request."""
+    if "/WebTracker/" not in line:
+        return None
+    match = WEBTRACKER_RE.search(line)
+    if match:
+        return Log(match.groups())
+    return None
+
+def parse_beacon_path(path:str):
+    """Returns the Log object of a WebTracker request path, or None if the path is not a beacon."""
+    match = WEBTRACKER_PATH_RE.fullmatch(path)
+    if match:
+        return Log(match.groups())
+    return None
+
+def session_hash(userid, url, tabid):
+    """Returns the hex digest displayed for the session of a (userid, url, tabid) key."""
+    str_to_hash = f"{userid}{url}{tabid}"
+    hash_obj =  hashlib.md5(bytes(str_to_hash, "utf-8"))
+    return hash_obj.hexdigest()
 
 class Log():
     """Class to define the fields of a line in a log file."""
 
+    __slots__ = ("_timestamp", "_userid", "_tabid", "_url", "_status", "_session_hash")
+
     def __init__(self, log_str):
-        self._log_str = log_str
-        self._timestamp, self._userid, self._tabid, self._url, self._status = self._log_str
-        self._timestamp = int(self._timestamp)
-        self._tabid = int(self._tabid)
-        self._status = int(self._status)
-        self._session_hash = self._hash()
-
-    def _hash(self):
-        str_to_hash = f"{self.userid}{self.url}{self.tabid}"
-        hash_obj =  hashlib.md5(bytes(str_to_hash, "utf-8"))
-        return hash_obj.hexdigest()
+        timestamp, userid, tabid, url, status = log_str
+        self._timestamp = int(timestamp)
+        self._userid = sys.intern(userid)
+        self._tabid = int(tabid)
+        self._url = sys.intern(url)
+        self._status = int(status)
+        self._session_hash = None
         
     def __str__(self):
         return f"\t\tTIMESTAMP: {self._timestamp}\tUSERID: {self._userid}\tTABID: {self._tabid}\tURL: {self._url}\tSTATUS: {self._status}"
@@ -38,6 +66,11 @@ class Log():
     def status(self):
         return self._status
     @property
+    def session_key(self):
+        return (self._userid, self._url, self._tabid)
+    @property
     def session_hash(self):
+        if self._session_hash is None:
+            self._session_hash = session_hash(self._userid, self._url, self._tabid)
         return self._session_hash
 
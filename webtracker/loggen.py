@@ -0,0 +1,116 @@
+from argparse import ArgumentParser
+import hashlib
+import heapq
+import itertools
+import random
+import time
+
+LINE_FORMAT = '- - [{date}] "POST /WebTracker/{timestamp}:{userid}:{tabid}:{url}:{status} HTTP/1.1" 404 522 "-" "Mozilla/5.0"\n'
+NOISE_LINE = '- - [{date}] "GET /favicon.ico HTTP/1.1" 404 495 "-" "-"\n'
+START_TIMESTAMP = 1654066366290 # ms, the start of 10000log.txt
+LOGS_PER_USER = 1000
+
+def get_id(prefix, idx, length):
+    """Returns a deterministic hex id shaped like the extension's userids (16 chars) or url hashes (128 chars)."""
+    digest = hashlib.sha512(f"{prefix}{idx}".encode()).hexdigest()
+    return digest[:length]
+
+def iter_sessions(rng, num_users, tabs_per_user, dloads_per_session, concurrency, skew, num_urls):
+    """Yields (start, userid, tabid, url, [(offset, status), ...]) sessions forever, heavy users chosen more often.
+
+    User i is picked with weight 1 / (i + 1) ** skew, so skew 0 spreads sessions evenly and larger values
+    concentrate them on a few heavy users. A session is a page visit (status 0) followed by its downloads
+    (status 1 then 2); with probability `concurrency` a download starts before the previous one has ended.
+    """
+    userids = [get_id("user", idx, 16) for idx in range(num_users)]
+    urls = [get_id("url", idx, 128) for idx in range(num_urls)]
+    cum_weights = list(itertools.accumulate(1 / (idx + 1) ** skew for idx in range(num_users)))
+    start = START_TIMESTAMP
+    while True:
+        start += rng.randint(1, 2000)
+        userid = rng.choices(userids, cum_weights=cum_weights)[0]
+        tabid = rng.randrange(tabs_per_user)
+        events = [(0, 0)]
+        offset = rng.randint(50, 1000)
+        end = offset
+        for _ in range(dloads_per_session):
+            duration = rng.randint(200, 15000)
+            events.append((offset, 1))
+            events.append((offset + duration, 2))
+            end = max(end, offset + duration)
+            if rng.random() < concurrency:
+                offset += rng.randint(1, duration) # starts while this download is still running
+            else:
+                offset = end + rng.randint(50, 5000)
+        yield start, userid, tabid, rng.choice(urls), events
+
+def generate_lines(num_lines, num_users=None, tabs_per_user=3, dloads_per_session=4, concurrency=0.2, skew=1.0,
+        noise=0.05, num_urls=None, seed=0):
+    """Yields num_lines synthetic access log lines in timestamp order, a `noise` fraction of them not WebTracker requests."""
+    rng = random.Random(seed)
+    if num_users is None:
+        num_users = max(1, num_lines // LOGS_PER_USER)
+    if num_urls is None:
+        num_urls = max(10, num_users * 10)
+    sessions = iter_sessions(rng, num_users, tabs_per_user, dloads_per_session, concurrency, skew, num_urls)
+    pending = []
+    dates = {}
+    num_written = 0
+    while num_written < num_lines:
+        start, userid, tabid, url, events = next(sessions)
+        for offset, status in events:
+            heapq.heappush(pending, (start + offset, userid, tabid, url, status))
+        # Everything before the start of the newest session can no longer be preceded by a later event.
+        while pending and pending[0][0] <= start and num_written < num_lines:
+            timestamp, userid, tabid, url, status = heapq.heappop(pending)
+            second = timestamp // 1000
+            date = dates.get(second)
+            if date is None:
+                dates.clear()
+                date = dates[second] = time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(second))
+            if rng.random() < noise:
+                yield NOISE_LINE.format(date=date)
+                num_written += 1
+                if num_written == num_lines:
+                    break
+            yield LINE_FORMAT.format(date=date, timestamp=timestamp, userid=userid, tabid=tabid, url=url, status=status)
+            num_written += 1
+
+def write_log(filename, num_lines, **kwargs):
+    with open(filename, 'w') as fp:
+        fp.writelines(generate_lines(num_lines, **kwargs))
+
+def add_generator_args(parser):
+    parser.add_argument("--users", dest="num_users", type=int, default=None,
+                    help=f"number of users (default: one per {LOGS_PER_USER} lines)", metavar="N")
+    parser.add_argument("--tabs", dest="tabs_per_user", type=int, default=3,
+                    help="tabs per user (default: 3)", metavar="N")
+    parser.add_argument("--dloads", dest="dloads_per_session", type=int, default=4,
+                    help="downloads per session (default: 4)", metavar="N")
+    parser.add_argument("--concurrency", dest="concurrency", type=float, default=0.2,
+                    help="fraction of downloads that start before the previous one ends (default: 0.2)", metavar="FRACTION")
+    parser.add_argument("--skew", dest="skew", type=float, default=1.0,
+                    help="Zipf exponent of the share of sessions per user; 0 is uniform (default: 1.0)", metavar="S")
+    parser.add_argument("--seed", dest="seed", type=int, default=0,
+                    help="random seed (default: 0)", metavar="N")
+
+def get_generator_kwargs(args):
+    return {"num_users" : args.num_users, "tabs_per_user" : args.tabs_per_user, "dloads_per_session" : args.dloads_per_session,
+        "concurrency" : args.concurrency, "skew" : args.skew, "seed" : args.seed}
+
+def handle_args():
+    parser = ArgumentParser(description='Generate a synthetic WebTracker access log')
+    parser.add_argument("-n", "--lines", dest="num_lines", type=int, required=True,
+                    help="number of lines to write", metavar="N")
+    parser.add_argument("-o", "--output", dest="filename", required=True,
+                    help="output log file", metavar="FILE")
+    add_generator_args(parser)
+    return parser.parse_args()
+
+def main() -> int:
+    args = handle_args()
+    write_log(args.filename, args.num_lines, **get_generator_kwargs(args))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+from array import array
+from itertools import chain
+from operator import attrgetter
+from log import Log
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class LogTable():
+    """Columnar store of parsed logs: one typed array per field, with userids and urls interned to integer ids.
+
+    It backs the on-disk cache (LogCache) and the logs of closed users in incremental mode (Checkpoint). Session and
+    User still hold slotted Log objects: downloads and overlaps keep references to their start and end logs, so the
+    analysis materialises rows with get_log() rather than indexing the columns.
+    """
+
+    def __init__(self):
+        self._timestamps = array('q')
+        self._userids = array('i')
+        # The parser accepts any number as a tabid or status, so they get the full width of the timestamps.
+        self._tabids = array('q')
+        self._urls = array('i')
+        self._statuses = array('q')
+        self._userid_names = []
+        self._url_names = []
+        self._userid_index = {}
+        self._url_index = {}
+
+    @classmethod
+    def from_logs(cls, logs):
+        table = cls()
+        for log in logs:
+            table.add_log(log)
+        return table
+
+    def _intern(self, value, names, index):
+        try:
+            return index[value]
+        except KeyError:
+            index[value] = len(names)
+            names.append(value)
+            return index[value]
+
+    def add_log(self, log):
+        self._timestamps.append(log.timestamp)
+        self._userids.append(self._intern(log.userid, self._userid_names, self._userid_index))
+        self._tabids.append(log.tabid)
+        self._urls.append(self._intern(log.url, self._url_names, self._url_index))
+        self._statuses.append(log.status)
+
+    def get_log(self, index):
+        return Log((self._timestamps[index], self._userid_names[self._userids[index]], self._tabids[index],
+            self._url_names[self._urls[index]], self._statuses[index]))
+
+    def to_numpy(self):
+        """Returns zero-copy NumPy views of the columns."""
+        return {
+            "timestamp" : np.frombuffer(self._timestamps, dtype=np.int64),
+            "userid" : np.frombuffer(self._userids, dtype=np.int32),
+            "tabid" : np.frombuffer(self._tabids, dtype=np.int64),
+            "url" : np.frombuffer(self._urls, dtype=np.int32),
+            "status" : np.frombuffer(self._statuses, dtype=np.int64),
+        }
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __getitem__(self, index):
+        return self.get_log(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get_log(index)
+
+    @property
+    def timestamps(self):
+        return self._timestamps
+    @property
+    def userids(self):
+        return self._userids
+    @property
+    def tabids(self):
+        return self._tabids
+    @property
+    def urls(self):
+        return self._urls
+    @property
+    def statuses(self):
+        return self._statuses
+    @property
+    def userid_names(self):
+        return self._userid_names
+    @property
+    def url_names(self):
+        return self._url_names
+
+
+def extract_downloads(sessions):
+    """Sorts the logs of every session and finds their downloads, average download time and duration in one NumPy pass.
+
+    All session logs are laid out as flat (session, timestamp, status) columns; a download is any status 1 log
+    directly followed by a status 2 log of the same session, which is a single shifted-array comparison.
+    Falls back to the per-session methods when NumPy is not installed.
+    """
+    if np is None or not sessions:
+        for session in sessions:
+            session.sort_logs()
+            session.get_downloads()
+            session.get_avg_dload_time()
+            session.get_duration()
+        return
+
+    lengths = np.fromiter(map(len, (session.logs for session in sessions)), dtype=np.int64, count=len(sessions))
+    num_logs = int(lengths.sum())
+    logs = list(chain.from_iterable(session.logs for session in sessions))
+    session_ids = np.repeat(np.arange(len(sessions)), lengths)
+    timestamps = np.fromiter(map(attrgetter("timestamp"), logs), dtype=np.int64, count=num_logs)
+    statuses = np.fromiter(map(attrgetter("status"), logs), dtype=np.int64, count=num_logs)
+
+    order = np.lexsort((timestamps, session_ids))
+    timestamps = timestamps[order]
+    statuses = statuses[order]
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+    starts = np.flatnonzero((statuses[:-1] == 1) & (statuses[1:] == 2) & (session_ids[:-1] == session_ids[1:]))
+    dload_sessions = session_ids[starts]
+    dload_times = timestamps[starts + 1] - timestamps[starts]
+    num_dloads = np.bincount(dload_sessions, minlength=len(sessions))
+    total_dload_times = np.bincount(dload_sessions, weights=dload_times, minlength=len(sessions))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_dload_times = total_dload_times / num_dloads
+
+    # Logs usually arrive in time order, so only the sessions whose order changed get their lists rebuilt.
+    unsorted = np.unique(session_ids[order != np.arange(num_logs)])
+    for session_id in unsorted.tolist():
+        first, last = int(offsets[session_id]), int(offsets[session_id + 1])
+        sessions[session_id].set_sorted_logs([logs[idx] for idx in order[first:last].tolist()])
+
+    for session_id, start in zip(dload_sessions.tolist(), starts.tolist()):
+        sessions[session_id].add_download(logs[order[start]], logs[order[start + 1]])
+
+    session_starts = timestamps[offsets[:-1]].tolist()
+    session_ends = timestamps[offsets[1:] - 1].tolist()
+    has_dloads = (0 < num_dloads).tolist()
+    for session, start, end, has_dload, avg_dload_time in zip(sessions, session_starts, session_ends, has_dloads, avg_dload_times.tolist()):
+        session.set_dload_stats(start, end, avg_dload_time if has_dload else None)
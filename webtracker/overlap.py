@@ -1,5 +1,8 @@
 class Overlap():
-    """An Overlap is defined as where one website is still downloading while a second one starts downloading."""
+    """An Overlap is defined as where one website is still downloading while a second one starts downloading.
+
+    Its metrics are computed on first access of their properties, so they can be read in any order.
+    """
 
     def __init__(self, user, start, overlapping_starts, end):
         self._user = user
@@ -8,15 +11,26 @@ class Overlap():
         self._end = end
         self._overlap_start = None
         self._overlap_end = None
-        self._urls = []
-        self._unique_urls = []
+        self._urls = None
+        self._unique_urls = None
         self._duration = None
         self._time_before_overlap_starts = None
-        self._num_urls = 0
+        self._num_urls = None
         self._overlapped_url = None
         self._overlapping_url = None
 
 
+    def get_metrics(self):
+        """Computes every overlap metric up front, e.g. before the overlap is summarized."""
+        self.get_overlap_start()
+        self.get_overlap_end()
+        self.get_duration()
+        self.get_time_before_overlap_starts()
+        self.get_overlapping_url()
+        self.get_overlapped_url()
+        self.get_urls()
+        self.get_num_urls()
+
     def get_overlap_start(self):
         self._overlap_start = self._overlapping_starts[0].start
 
@@ -26,11 +40,11 @@ class Overlap():
         self._overlap_end = endslist[-2]
 
     def get_duration(self):
-        self._duration = self._overlap_end - self._overlap_start
+        self._duration = self.overlap_end - self.overlap_start
 
     def get_time_before_overlap_starts(self):
         if 2 <= len(self._overlapping_starts):
-            self._time_before_overlap_starts = self._overlap_start - self._start.start
+            self._time_before_overlap_starts = self.overlap_start - self._start.start
 
     def get_overlapped_url(self):
         self._overlapped_url = self.start.url
@@ -39,23 +53,20 @@ class Overlap():
         self._overlapping_url = self._overlapping_starts[0].url
 
     def get_urls(self):
-        self._urls.append(self._start.url)
-        for dload in self._overlapping_starts:
-            self._urls.append(dload.url)
-        self._urls.append(self._end.url)
+        self._urls = [self._start.url, *(dload.url for dload in self._overlapping_starts), self._end.url]
         self._unique_urls = list(dict.fromkeys(self._urls))
 
     def get_num_urls(self):
         percentages = []
-        first_dload_percent = (self._start.end - self._overlap_start) / self._duration
+        first_dload_percent = (self._start.end - self.overlap_start) / self.duration
         percentages.append(first_dload_percent)
         
         overlapping_log_percents = []
         for dload in self._overlapping_starts:
-            if dload.end <= self._overlap_end:
-                percent = (dload.end - dload.start) / self._duration
-            elif dload.end > self._overlap_end:
-                percent = (self._overlap_end - dload.start) / self._duration
+            if dload.end <= self.overlap_end:
+                percent = (dload.end - dload.start) / self.duration
+            elif dload.end > self.overlap_end:
+                percent = (self.overlap_end - dload.start) / self.duration
             else:
                 continue
             overlapping_log_percents.append(percent)
@@ -68,6 +79,8 @@ class Overlap():
         return self._start
     @property
     def overlap_start(self):
+        if self._overlap_start is None:
+            self.get_overlap_start()
         return self._overlap_start
     @property
     def overlapping_starts(self):
@@ -77,26 +90,42 @@ class Overlap():
         return self._end
     @property
     def overlap_end(self):
+        if self._overlap_end is None:
+            self.get_overlap_end()
         return self._overlap_end
     @property
     def urls(self):
+        if self._urls is None:
+            self.get_urls()
         return self._urls
     @property
     def unique_urls(self):
+        if self._unique_urls is None:
+            self.get_urls()
         return self._unique_urls
     @property
     def duration(self):
+        if self._duration is None:
+            self.get_duration()
         return self._duration
     @property
     def time_before_overlap_starts(self):
+        if self._time_before_overlap_starts is None and 2 <= len(self._overlapping_starts):
+            self.get_time_before_overlap_starts()
         return self._time_before_overlap_starts
     @property
     def num_urls(self):
+        if self._num_urls is None:
+            self.get_num_urls()
         return self._num_urls
     @property
     def overlapping_url(self):
+        if self._overlapping_url is None:
+            self.get_overlapping_url()
         return self._overlapping_url
     @property
     def overlapped_url(self):
+        if self._overlapped_url is None:
+            self.get_overlapped_url()
         return self._overlapped_url
 
@@ -0,0 +1,80 @@
+OUTPUTS = ("user", "url", "download", "overlap", "total_overlap")
+
+# Optional analysis stages of generate_user_info; everything else comes from the sessions alone.
+STAGES = ("dloads", "overlaps")
+
+# The metric columns of each output (field names without their unit) and the stage each one needs. Columns not
+# listed, such as the user or URL a row is about, are labels and are always kept.
+OUTPUT_METRICS = {
+    "user" : {
+        "num_logs" : None, "browsing_time" : None, "num_sessions" : None, "avg_session_time" : None,
+        "num_dloads" : "dloads", "percent_dloads" : "dloads", "num_urls_visited" : None,
+        "num_overlaps" : "overlaps", "percent_overlaps" : "overlaps", "avg_overlap_duration" : "overlaps",
+        "avg_time_between_overlaps" : "overlaps", "avg_num_urls_per_overlap" : "overlaps",
+    },
+    "url" : {
+        "num_times_dloaded" : "dloads", "avg_dload_time" : "dloads",
+        "involved_in_an_overlap" : "overlaps", "begins_an_overlap" : "overlaps",
+    },
+    "download" : {
+        "dload_duration" : "dloads",
+    },
+    "overlap" : {
+        "overlap_duration" : "overlaps", "time_before_overlap_starts" : "overlaps",
+        "url_that_begins_the_overlap" : "overlaps", "num_urls_per_overlap" : "overlaps",
+    },
+    "total_overlap" : {
+        "avg_time_between_overlaps" : "overlaps", "avg_overlap_duration" : "overlaps", "avg_time_before_overlap_starts" : "overlaps",
+        "avg_num_urls_per_overlaps" : "overlaps", "most_common_url_that_begins_an_overlap" : "overlaps",
+    },
+}
+
+METRICS = sorted(set(metric for metrics in OUTPUT_METRICS.values() for metric in metrics))
+
+def get_metric(field):
+    """Returns the metric name of an output field, e.g. 'browsing_time' for 'browsing_time (hrs)'."""
+    return field.split(" (")[0]
+
+class MetricPlan():
+    """The outputs and metric columns requested on the command line, and the analysis stages they need.
+
+    With no metrics given, every column of each requested output is produced. With metrics given, an output keeps
+    its label columns plus the requested metrics it has, and is dropped if it has none of them.
+    """
+
+    def __init__(self, outputs=None, metrics=None):
+        self._outputs = list(OUTPUTS if outputs is None else dict.fromkeys(outputs))
+        self._metrics = None if metrics is None else set(metrics)
+        if self._metrics is not None:
+            self._outputs = [output for output in self._outputs if self._metrics & set(OUTPUT_METRICS[output])]
+        self._stages = self._get_stages()
+
+    def _get_stages(self):
+        stages = set()
+        for output in self._outputs:
+            for metric, stage in OUTPUT_METRICS[output].items():
+                if stage is not None and (self._metrics is None or metric in self._metrics):
+                    stages.add(stage)
+        # Overlaps are found among the downloads.
+        if "overlaps" in stages:
+            stages.add("dloads")
+        return frozenset(stages)
+
+    def get_columns(self, output, fields):
+        """Returns the indices of the fields of an output to produce: its labels and the requested metrics."""
+        metrics = OUTPUT_METRICS[output]
+        return [idx for idx, field in enumerate(fields)
+            if self._metrics is None or get_metric(field) not in metrics or get_metric(field) in self._metrics]
+
+    def wants(self, output):
+        return output in self._outputs
+
+    @property
+    def outputs(self):
+        return self._outputs
+    @property
+    def metrics(self):
+        return self._metrics
+    @property
+    def stages(self):
+        return self._stages
@@ -0,0 +1,180 @@
+from contextlib import contextmanager
+import itertools
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+TOP_USERS = 20
+# Items pulled at a time by Profiler.iter_timed, so the clocks are read once per chunk rather than per item.
+TIMED_CHUNK_SIZE = 4096
+
+def get_max_rss_mb(children=False):
+    """Returns the largest RSS the process (or its biggest finished child) has had so far, or None without resource."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def get_rss_mb():
+    """Returns the current RSS of this process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def get_cpu_time():
+    """Returns the CPU seconds of this process and of its finished children, such as pool workers."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def round_mb(value_mb):
+    return None if value_mb is None else round(value_mb, 1)
+
+def format_delta(delta_mb):
+    return "" if delta_mb is None else f"({delta_mb:+.1f}MB)"
+
+def format_max(max_mb):
+    return "n/a" if max_mb is None else f"{max_mb:.1f}MB"
+
+class UserSteps():
+    """Mergeable per-step and per-user timings of generate_user_info, built by each worker and reduced in the parent."""
+
+    def __init__(self):
+        self._steps = {}
+        self._user_seconds = {}
+        self._user_counts = {}
+
+    def time_step(self, user, func, *args):
+        """Calls func(*args) and adds its wall time to its step (named after the function) and to the user."""
+        start = time.perf_counter()
+        func(*args)
+        seconds = time.perf_counter() - start
+        step = self._steps.setdefault(func.__qualname__, [0, 0.0])
+        step[0] += 1
+        step[1] += seconds
+        self._user_seconds[user.id] = self._user_seconds.get(user.id, 0.0) + seconds
+
+    def add_user_counts(self, user):
+        """Records the counts that explain a user's cost from their UserSummary, so skipped stages stay skipped."""
+        self._user_counts[user.id] = (user.num_logs, len(user.dloads), len(user.overlaps))
+
+    def merge(self, other):
+        for name, (calls, seconds) in other._steps.items():
+            step = self._steps.setdefault(name, [0, 0.0])
+            step[0] += calls
+            step[1] += seconds
+        self._user_seconds.update(other._user_seconds)
+        self._user_counts.update(other._user_counts)
+        return self
+
+    def get_report(self, top_users=TOP_USERS):
+        slowest = sorted(self._user_seconds.items(), key=lambda item: -item[1])[:top_users]
+        return {
+            "steps" : {name : {"calls" : calls, "seconds" : round(seconds, 6)}
+                for name, (calls, seconds) in sorted(self._steps.items(), key=lambda item: -item[1][1])},
+            "slowest_users" : [dict(zip(("user", "seconds", "num_logs", "num_dloads", "num_overlaps"),
+                (userid, round(seconds, 6), *self._user_counts.get(userid, (None, None, None))))) for userid, seconds in slowest],
+        }
+
+    @property
+    def steps(self):
+        return self._steps
+    @property
+    def user_seconds(self):
+        return self._user_seconds
+
+
+class Profiler():
+    """Records wall time, CPU time, memory and item counts of each pipeline stage, plus the UserSteps of
+    generate_user_info, and writes them as a JSON report."""
+
+    def __init__(self):
+        self._stages = []
+        self._user_steps = UserSteps()
+        self._nested = [0.0, 0.0]
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block as one stage; the block may set the "items" key of the yielded record.
+
+        rss_delta_mb is the change of the current RSS over the stage. max_rss_mb is ru_maxrss, the largest RSS of the
+        process so far, so it only tells a stage apart when that stage sets a new maximum.
+        """
+        record = {"stage" : name, "items" : None}
+        nested = self._nested = [0.0, 0.0]
+        start_rss = get_rss_mb()
+        start_wall = time.perf_counter()
+        start_cpu = get_cpu_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - start_wall - nested[0], 6)
+            record["cpu_seconds"] = round(get_cpu_time() - start_cpu - nested[1], 6)
+            end_rss = get_rss_mb()
+            record["rss_delta_mb"] = None if start_rss is None or end_rss is None else round(end_rss - start_rss, 1)
+            record["max_rss_mb"] = round_mb(get_max_rss_mb())
+            record["max_worker_rss_mb"] = round_mb(get_max_rss_mb(children=True))
+            self._stages.append(record)
+
+    def iter_timed(self, name, iterable, chunk_size=TIMED_CHUNK_SIZE):
+        """Yields the items of iterable and, once it is exhausted, records the time spent producing them as a stage.
+
+        This splits a streaming producer, such as the log reader, from the stage consuming it: that time is taken off
+        the enclosing stage. Memory cannot be split that way, so the enclosing stage keeps the RSS figures.
+        """
+        record = {"stage" : name, "items" : 0, "wall_seconds" : 0.0, "cpu_seconds" : 0.0}
+        nested = self._nested
+        iterator = iter(iterable)
+        while True:
+            start_wall = time.perf_counter()
+            start_cpu = get_cpu_time()
+            chunk = list(itertools.islice(iterator, chunk_size))
+            wall = time.perf_counter() - start_wall
+            cpu = get_cpu_time() - start_cpu
+            record["wall_seconds"] += wall
+            record["cpu_seconds"] += cpu
+            nested[0] += wall
+            nested[1] += cpu
+            record["items"] += len(chunk)
+            if not chunk:
+                break
+            yield from chunk
+        record["wall_seconds"] = round(record["wall_seconds"], 6)
+        record["cpu_seconds"] = round(record["cpu_seconds"], 6)
+        record.update({"rss_delta_mb" : None, "max_rss_mb" : round_mb(get_max_rss_mb()), "max_worker_rss_mb" : round_mb(get_max_rss_mb(children=True))})
+        self._stages.append(record)
+
+    def add_user_steps(self, user_steps):
+        self._user_steps.merge(user_steps)
+
+    def get_report(self):
+        return {"stages" : self._stages, **self._user_steps.get_report()}
+
+    def save(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.get_report(), fp, indent=2)
+            fp.write("\n")
+
+    def print_report(self):
+        report = self.get_report()
+        print("Profile")
+        for record in report["stages"]:
+            items = "" if record["items"] is None else f" {record['items']:>10} items"
+            print(f"  {record['stage']:<32} {record['wall_seconds']:>9.3f}s wall {record['cpu_seconds']:>9.3f}s cpu "
+                f"{format_max(record['max_rss_mb']):>10} max RSS so far {format_delta(record['rss_delta_mb'])}{items}")
+        for name, step in list(report["steps"].items())[:5]:
+            print(f"  {name:<32} {step['seconds']:>9.3f}s over {step['calls']} calls")
+        for row in report["slowest_users"][:5]:
+            print(f"  USER: {row['user']} {row['seconds']:.3f}s ({row['num_logs']} logs, {row['num_dloads']} downloads, {row['num_overlaps']} overlaps)")
+
+    @property
+    def stages(self):
+        return self._stages
+    @property
+    def user_steps(self):
+        return self._user_steps
@@ -0,0 +1,134 @@
+import asyncio
+from log import parse_beacon_path
+
+REASONS = {204: "No Content", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}
+# Beacons carry everything in their path, so any body is read and discarded; larger ones are refused unread.
+MAX_BODY_SIZE = 64 * 1024
+
+class BeaconServer():
+    """Asyncio HTTP endpoint that accepts WebTracker beacons directly and feeds them to a LiveTracker.
+
+    Each request path is parsed with the same rules as the access log parser. Parsed logs go through a bounded
+    queue: when the tracker falls behind, connection handlers wait on the queue and stop reading from their sockets,
+    so clients are slowed down by TCP backpressure instead of memory growing. A single consumer task drains the
+    queue in batches of up to batch_size logs.
+    """
+
+    def __init__(self, tracker, host="127.0.0.1", port=8080, queue_size=10000, batch_size=500, max_body_size=MAX_BODY_SIZE):
+        self._tracker = tracker
+        self._host = host
+        self._port = port
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._max_body_size = max_body_size
+        self._queue = None
+        self._server = None
+        self._consumer = None
+        self._num_accepted = 0
+        self._num_rejected = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(self._queue_size)
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        """Stops accepting connections and waits until every queued beacon has reached the tracker."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self._queue.join()
+        self._consumer.cancel()
+
+    async def serve(self, report_interval, on_report):
+        """Runs until cancelled, calling on_report(tracker.get_report()) every report_interval seconds."""
+        await self.start()
+        try:
+            while True:
+                await asyncio.sleep(report_interval)
+                on_report(self._tracker.get_report())
+        finally:
+            await self.stop()
+
+    async def _consume(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for log in batch:
+                self._tracker.add_log(log)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                too_large = self._max_body_size < length
+                if 0 < length and not too_large:
+                    await reader.readexactly(length)
+
+                if too_large:
+                    status = 413
+                elif 3 != len(parts):
+                    status = 400
+                else:
+                    log = parse_beacon_path(parts[1])
+                    status = 404 if log is None else 204
+                if 204 == status:
+                    await self._queue.put(log)
+                    self._num_accepted += 1
+                else:
+                    self._num_rejected += 1
+
+                # The unread body of a refused request is still on the socket, so the connection cannot be reused.
+                keep_alive = (not too_large and 3 == len(parts) and "HTTP/1.1" == parts[2]
+                    and "close" != headers.get("connection", "").lower())
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1'))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @property
+    def port(self):
+        return self._port
+    @property
+    def num_accepted(self):
+        return self._num_accepted
+    @property
+    def num_rejected(self):
+        return self._num_rejected
+
+
+async def post_beacons(paths, host="127.0.0.1", port=8080):
+    """Minimal client: POSTs each beacon path over one keep-alive connection and returns the response status codes."""
+    reader, writer = await asyncio.open_connection(host, port)
+    statuses = []
+    try:
+        for path in paths:
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: 0\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status_line = await reader.readline()
+            statuses.append(int(status_line.split()[1]))
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return statuses
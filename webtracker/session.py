@@ -1,18 +1,24 @@
 
 from download import Download
+from log import Log, session_hash
 
 class Session():
-    """Session objects are defined as a group of logs with the same userid, url, and tabid."""
+    """Session objects are defined as a group of logs with the same userid, url, and tabid.
 
-    def __init__(self, session_id):
-        self._session_id = session_id
+    Bounds, downloads and their stats are usually set in bulk by extract_downloads; otherwise they are computed
+    from the logs on first access.
+    """
+
+    def __init__(self, session_key):
+        self._session_key = session_key
+        self._session_id = None
         self._session_logs = []
         self.userid = None
         self.url = None
         self.tabid = None
         self._start = None
         self._end = None
-        self._downloads = []
+        self._downloads = None
         self._avg_dload_time = None
         self._duration = None
 
@@ -23,6 +29,26 @@ class Session():
         self._end = self._session_logs[-1].timestamp
 
 
+    def set_sorted_logs(self, logs):
+        """Replaces the session logs with an already time-ordered list."""
+        self._session_logs = logs
+        self._start = logs[0].timestamp
+        self._end = logs[-1].timestamp
+
+    def add_download(self, start_log, end_log):
+        if self._downloads is None:
+            self._downloads = []
+        self._downloads.append(Download(self, self.url, self._session_key, start_log, end_log))
+
+    def set_dload_stats(self, start, end, avg_dload_time):
+        """Stores the bounds and download stats computed in bulk for many sessions at once."""
+        self._start = start
+        self._end = end
+        if self._downloads is None:
+            self._downloads = []
+        self._avg_dload_time = avg_dload_time
+        self._duration = end - start
+
     def add_log(self, log):
         if not self.userid:
             self.userid = log.userid
@@ -31,27 +57,24 @@ class Session():
         self._session_logs.append(log)
     
     def get_downloads(self):
-        if 2 <= len(self._session_logs):
-            for index, log in enumerate(self._session_logs):
-                try:
-                    if 1 == self._session_logs[index].status and 2 == self._session_logs[index + 1].status:
-                        self._downloads.append(Download(self, self.url, self._session_id, log, self._session_logs[index + 1]))
-                except:
-                    continue
+        if self._start is None:
+            self.sort_logs()
+        self._downloads = []
+        for log, next_log in zip(self._session_logs, self._session_logs[1:]):
+            if 1 == log.status and 2 == next_log.status:
+                self.add_download(log, next_log)
 
     def get_avg_dload_time(self):
-        download_times = []
-        for download in self._downloads:
-            download_times.append(download.end - download.start)
+        download_times = [download.end - download.start for download in self.downloads]
         if download_times:
             self._avg_dload_time = sum(download_times) / len(download_times)
 
     def get_duration(self):
-         self._duration = self._end - self._start
+         self._duration = self.end - self.start
     
 
     def __str__(self):
-        ret_str = f"\tSESSION HASH:{self._session_id}"
+        ret_str = f"\tSESSION HASH:{self.hash}"
         for log in self._session_logs:
             ret_str += f"\n\t{log.__str__()}"
 
@@ -59,27 +82,42 @@ class Session():
 
     def __contains__(self, log):
         if isinstance(log, Log):
-            return log.session_hash == self._session_id
+            return log.session_key == self._session_key
 
     @property
     def downloads(self):
+        if self._downloads is None:
+            self.get_downloads()
         return self._downloads
     @property
     def start(self):
+        if self._start is None:
+            self.sort_logs()
         return self._start
     @property
     def end(self):
+        if self._end is None:
+            self.sort_logs()
         return self._end
     @property
     def logs(self):
         return self._session_logs
     @property
+    def key(self):
+        return self._session_key
+    @property
     def hash(self):
+        if self._session_id is None:
+            self._session_id = session_hash(*self._session_key)
         return self._session_id
     @property
     def avg_dload_time(self):
+        if self._avg_dload_time is None and self.downloads:
+            self.get_avg_dload_time()
         return self._avg_dload_time
     @property
     def duration(self):
+        if self._duration is None:
+            self.get_duration()
         return self._duration
 
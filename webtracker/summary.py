@@ -0,0 +1,146 @@
+from plan import STAGES
+
+
+class DownloadSummary():
+    """Compact record of one finished download."""
+
+    __slots__ = ("_url", "_start", "_end", "_duration")
+
+    def __init__(self, download):
+        self._url = download.url
+        self._start = download.start
+        self._end = download.end
+        self._duration = download.duration
+
+    @property
+    def url(self):
+        return self._url
+    @property
+    def start(self):
+        return self._start
+    @property
+    def end(self):
+        return self._end
+    @property
+    def duration(self):
+        return self._duration
+
+
+class OverlapSummary():
+    """Compact record of the metrics of one Overlap."""
+
+    __slots__ = ("_overlap_start", "_overlap_end", "_duration", "_time_before_overlap_starts",
+        "_overlapping_url", "_overlapped_url", "_unique_urls", "_num_urls")
+
+    def __init__(self, overlap):
+        self._overlap_start = overlap.overlap_start
+        self._overlap_end = overlap.overlap_end
+        self._duration = overlap.duration
+        self._time_before_overlap_starts = overlap.time_before_overlap_starts
+        self._overlapping_url = overlap.overlapping_url
+        self._overlapped_url = overlap.overlapped_url
+        self._unique_urls = overlap.unique_urls
+        self._num_urls = overlap.num_urls
+
+    @property
+    def overlap_start(self):
+        return self._overlap_start
+    @property
+    def overlap_end(self):
+        return self._overlap_end
+    @property
+    def duration(self):
+        return self._duration
+    @property
+    def time_before_overlap_starts(self):
+        return self._time_before_overlap_starts
+    @property
+    def overlapping_url(self):
+        return self._overlapping_url
+    @property
+    def overlapped_url(self):
+        return self._overlapped_url
+    @property
+    def unique_urls(self):
+        return self._unique_urls
+    @property
+    def num_urls(self):
+        return self._num_urls
+
+
+class UserSummary():
+    """Compact record of the metrics of one User, small enough to send back from a worker process."""
+
+    __slots__ = ("_userid", "_num_logs", "_browsing_time", "_num_sessions", "_avg_session_time", "_dloads",
+        "_percent_dloads", "_urls_visited", "_url_stats", "_overlaps", "_percent_overlaps", "_avg_overlap_time",
+        "_avg_time_between_overlaps", "_avg_num_urls_per_overlaps")
+
+    def __init__(self, user, stages=STAGES):
+        """Reads the metrics of the given analysis stages only; those of skipped stages stay empty or None."""
+        self._userid = user.id
+        self._num_logs = user.num_logs
+        self._browsing_time = user.browsing_time
+        self._num_sessions = len(user.sessions)
+        self._avg_session_time = user.avg_session_time
+        self._urls_visited = user.urls_visited
+        self._dloads = []
+        self._percent_dloads = None
+        self._url_stats = {}
+        if "dloads" in stages:
+            self._dloads = [DownloadSummary(dload) for dload in user.dloads]
+            self._percent_dloads = user.percent_dloads
+            self._url_stats = user.url_stats
+        self._overlaps = []
+        self._percent_overlaps = None
+        self._avg_overlap_time = None
+        self._avg_time_between_overlaps = None
+        self._avg_num_urls_per_overlaps = None
+        if "overlaps" in stages:
+            self._overlaps = [OverlapSummary(overlap) for overlap in user.overlaps]
+            self._percent_overlaps = user.percent_overlaps
+            self._avg_overlap_time = user.avg_overlap_time
+            self._avg_time_between_overlaps = user.avg_time_between_overlaps
+            self._avg_num_urls_per_overlaps = user.avg_num_urls_per_overlaps
+
+    @property
+    def id(self):
+        return self._userid
+    @property
+    def num_logs(self):
+        return self._num_logs
+    @property
+    def browsing_time(self):
+        return self._browsing_time
+    @property
+    def num_sessions(self):
+        return self._num_sessions
+    @property
+    def avg_session_time(self):
+        return self._avg_session_time
+    @property
+    def dloads(self):
+        return self._dloads
+    @property
+    def percent_dloads(self):
+        return self._percent_dloads
+    @property
+    def urls_visited(self):
+        return self._urls_visited
+    @property
+    def url_stats(self):
+        return self._url_stats
+    @property
+    def overlaps(self):
+        return self._overlaps
+    @property
+    def percent_overlaps(self):
+        return self._percent_overlaps
+    @property
+    def avg_overlap_time(self):
+        return self._avg_overlap_time
+    @property
+    def avg_time_between_overlaps(self):
+        return self._avg_time_between_overlaps
+    @property
+    def avg_num_urls_per_overlaps(self):
+        return self._avg_num_urls_per_overlaps
@@ -0,0 +1,78 @@
+from bisect import bisect_right
+
+def _find_alive(nxt, rank):
+    """Returns the first rank >= `rank` that has not been removed, compressing the skip path."""
+    root = rank
+    while nxt[root] != root:
+        root = nxt[root]
+    while nxt[rank] != root:
+        nxt[rank], rank = root, nxt[rank]
+    return root
+
+def _last_greatest_end(dloads):
+    """Returns the last download in `dloads` with the greatest end."""
+    greatest_end = max(dload.end for dload in dloads)
+    for dload in reversed(dloads):
+        if dload.end == greatest_end:
+            return dload
+
+def find_overlap_groups(dloads, index=None):
+    """Sweeps downloads sorted by (end, start) and returns (start, overlapping_starts, end) tuples for every overlap.
+
+    A download in front of the sweep is "in flight" for the current group when it starts after the group's
+    first download and no later than the end of the download at the sweep position. A group grows while at
+    least two downloads are in flight and is closed at the first position with fewer than two.
+    Downloads that remain ahead of the sweep are kept in start order with skip pointers over those already
+    passed, so each position costs two bisections plus the downloads newly added to the group.
+    The start order is taken from `index`, a DownloadIndex built over these same dloads, when one is given.
+    """
+    num_dloads = len(dloads)
+    groups = []
+    if 0 == num_dloads:
+        return groups
+
+    if index is None:
+        order = sorted(range(num_dloads), key=lambda idx: dloads[idx].start)
+        starts = [dloads[idx].start for idx in order]
+    else:
+        order, starts = index.order, index.starts
+    ranks = [0] * num_dloads
+    for rank, idx in enumerate(order):
+        ranks[idx] = rank
+    nxt = list(range(num_dloads + 1))
+
+    starting_dload = ending_dload = dloads[0]
+    group = {}
+    prev_in_flight = False
+    prev_end = None
+
+    for idx in range(num_dloads):
+        nxt[ranks[idx]] = ranks[idx] + 1
+        lo = bisect_right(starts, starting_dload.start)
+        group_end = ending_dload.end
+        hi = bisect_right(starts, group_end)
+        first = _find_alive(nxt, lo)
+        in_flight = first < hi and _find_alive(nxt, first + 1) < hi
+
+        if in_flight:
+            rank = first if not prev_in_flight else _find_alive(nxt, max(lo, bisect_right(starts, prev_end)))
+            added = []
+            while rank < hi:
+                added.append(order[rank])
+                rank = _find_alive(nxt, rank + 1)
+            for new_idx in sorted(added):
+                group[dloads[new_idx]] = None
+            ending_dload = dloads[idx + 1]
+        else:
+            if prev_in_flight:
+                overlapping_starts = list(group)
+                groups.append((starting_dload, overlapping_starts, _last_greatest_end(overlapping_starts)))
+                group = {}
+            elif idx + 1 < num_dloads:
+                ending_dload = dloads[idx + 1]
+            if idx + 1 < num_dloads:
+                starting_dload = dloads[idx + 1]
+
+        prev_in_flight = in_flight
+        prev_end = group_end
+    return groups
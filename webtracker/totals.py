@@ -1,13 +1,117 @@
-import collections
-from numpy import mean
-from statistics import mode
+from collections import Counter
+
+
+class PartialTotals():
+    """Mergeable running sums behind Totals, built by each worker over its own users and reduced in the parent."""
+
+    def __init__(self):
+        self._urls_visited = {}
+        self._all_urls_in_overlaps = {}
+        self._overlapping_url_counts = Counter()
+        self._num_times_dloaded = Counter()
+        self._dload_time_sums = Counter()
+        self._dload_time_counts = Counter()
+        self._num_overlaps = 0
+        self._overlap_duration_sum = 0
+        self._time_before_overlap_starts_sum = 0
+        self._num_urls_sum = 0
+        self._time_between_overlaps_sum = 0
+        self._time_between_overlaps_count = 0
+
+    @classmethod
+    def from_users(cls, users):
+        partial = cls()
+        for user in users:
+            partial.add_user(user)
+        return partial
+
+    def add_user(self, user):
+        for url in user.urls_visited:
+            self._urls_visited[url] = None
+        for url, (num_dloads, avg_dload_times) in user.url_stats.items():
+            self._num_times_dloaded[url] += num_dloads
+            for avg_dload_time in avg_dload_times:
+                self._dload_time_sums[url] += avg_dload_time / 1000 # convert ms to secs
+                self._dload_time_counts[url] += 1
+        for overlap in user.overlaps:
+            self._overlapping_url_counts[overlap.overlapping_url] += 1
+            for url in overlap.unique_urls:
+                self._all_urls_in_overlaps[url] = None
+            self._overlap_duration_sum += overlap.duration
+            self._time_before_overlap_starts_sum += overlap.time_before_overlap_starts
+            self._num_urls_sum += overlap.num_urls
+        self._num_overlaps += len(user.overlaps)
+        for prev_overlap, overlap in zip(user.overlaps, user.overlaps[1:]):
+            self._time_between_overlaps_sum += overlap.overlap_start - prev_overlap.overlap_end
+            self._time_between_overlaps_count += 1
+
+    def merge(self, other):
+        """Adds the sums of another PartialTotals into this one."""
+        self._urls_visited.update(other._urls_visited)
+        self._all_urls_in_overlaps.update(other._all_urls_in_overlaps)
+        self._overlapping_url_counts.update(other._overlapping_url_counts)
+        self._num_times_dloaded.update(other._num_times_dloaded)
+        self._dload_time_sums.update(other._dload_time_sums)
+        self._dload_time_counts.update(other._dload_time_counts)
+        self._num_overlaps += other._num_overlaps
+        self._overlap_duration_sum += other._overlap_duration_sum
+        self._time_before_overlap_starts_sum += other._time_before_overlap_starts_sum
+        self._num_urls_sum += other._num_urls_sum
+        self._time_between_overlaps_sum += other._time_between_overlaps_sum
+        self._time_between_overlaps_count += other._time_between_overlaps_count
+        return self
+
+    @property
+    def urls_visited(self):
+        return self._urls_visited
+    @property
+    def all_urls_in_overlaps(self):
+        return self._all_urls_in_overlaps
+    @property
+    def overlapping_url_counts(self):
+        return self._overlapping_url_counts
+    @property
+    def num_times_dloaded(self):
+        return self._num_times_dloaded
+    @property
+    def dload_time_sums(self):
+        return self._dload_time_sums
+    @property
+    def dload_time_counts(self):
+        return self._dload_time_counts
+    @property
+    def num_overlaps(self):
+        return self._num_overlaps
+    @property
+    def overlap_duration_sum(self):
+        return self._overlap_duration_sum
+    @property
+    def time_before_overlap_starts_sum(self):
+        return self._time_before_overlap_starts_sum
+    @property
+    def num_urls_sum(self):
+        return self._num_urls_sum
+    @property
+    def time_between_overlaps_sum(self):
+        return self._time_between_overlaps_sum
+    @property
+    def time_between_overlaps_count(self):
+        return self._time_between_overlaps_count
 
 
 class Totals():
-    """Pulls total data amongst users."""
+    """Pulls total data amongst users.
 
-    def __init__(self, users):
+    The aggregates are finalised from a PartialTotals: either one reduced from per-worker partials
+    (Totals.from_partials) or one built here in a single pass over the users. get_totals() runs on first use,
+    so the get_* methods and properties can be called in any order. The overlaps and overlapping_urls lists are
+    only available when Totals is built from users.
+    """
+
+    def __init__(self, users, partial=None):
         self._users = users
+        self._partial = partial
+        self._aggregated = False
         self._overlaps = []
         self._all_urls_in_overlaps = []
         self._overlapping_urls = []
@@ -23,130 +127,128 @@ class Totals():
         self._avg_num_urls_per_overlaps = 0
         self._most_common_url_that_begins_an_overlap = None
 
-    def get_overlaps(self):
-        for user in self._users:
-            if 0 < len(user.overlaps):
+    @classmethod
+    def from_partials(cls, partials):
+        """Reduces per-worker PartialTotals without walking any user again."""
+        partial = PartialTotals()
+        for other in partials:
+            partial.merge(other)
+        return cls([], partial)
+
+    def get_totals(self):
+        """Finalises every per-URL and global aggregate, building the partial sums in one pass over the users if needed."""
+        if self._aggregated:
+            return
+        self._aggregated = True
+
+        if self._partial is None:
+            self._partial = PartialTotals()
+            for user in self._users:
+                self._partial.add_user(user)
                 for overlap in user.overlaps:
                     self._overlaps.append(overlap)
+                    self._overlapping_urls.append(overlap.overlapping_url)
+        partial = self._partial
+
+        self._all_urls_in_overlaps = list(partial.all_urls_in_overlaps)
+        self._num_times_dloaded_per_url = dict(partial.num_times_dloaded)
+        self._avg_dload_time_per_url = {url : round(partial.dload_time_sums[url] / count, 2) for url, count in partial.dload_time_counts.items()}
+        self._url_is_involved_in_an_overlap = {url : "yes" for url in partial.urls_visited if url in partial.all_urls_in_overlaps}
+        self._url_begins_an_overlap = {url : "yes" for url in partial.urls_visited if url in partial.overlapping_url_counts}
+
+        if partial.num_overlaps:
+            self._avg_overlap_duration = round(partial.overlap_duration_sum / partial.num_overlaps, 2)
+            self._avg_time_before_overlap_starts = round(partial.time_before_overlap_starts_sum / partial.num_overlaps, 2)
+            self._avg_num_urls_per_overlaps = round(partial.num_urls_sum / partial.num_overlaps, 2)
+            self._most_common_url_that_begins_an_overlap = partial.overlapping_url_counts.most_common(1)[0][0]
+        if partial.time_between_overlaps_count:
+            self._avg_time_between_overlaps = round(partial.time_between_overlaps_sum / partial.time_between_overlaps_count, 2)
+
+    # The individual getters are kept for callers written against the per-metric API.
+    def get_overlaps(self):
+        self.get_totals()
 
     def get_all_urls_in_overlaps(self):
-        for overlap in self._overlaps:
-            for url in overlap.unique_urls:
-                if url not in self._all_urls_in_overlaps:
-                    self._all_urls_in_overlaps.append(url)
-    
+        self.get_totals()
+
     def get_overlapping_urls(self):
-        for overlap in self._overlaps:
-            self._overlapping_urls.append(overlap.overlapping_url)
+        self.get_totals()
 
     def get_avg_dload_time_per_url(self):
-        for user in self._users:
-            for url in user.urls_visited:
-                avg_times = collections.defaultdict(list)
-                for session in user.sessions:
-                    if url == session.url and session.avg_dload_time != None:
-                        avg_times[url].append(session.avg_dload_time / 1000 ) # convert ms to secs
-
-                for url, times in avg_times.items():
-                    dct = {url : round(mean(times), 2)}
-                    self._avg_dload_time_per_url.update(dct)
+        self.get_totals()
 
     def get_num_times_dloaded_per_url(self):
-        for user in self._users:
-            num_times = collections.defaultdict(list)
-            for session in user.sessions:
-                num = len(session.downloads)
-                num_times[session.url].append(num)
-
-            for url, times in num_times.items():
-                dct = {url : sum(times)}
-                self._num_times_dloaded_per_url.update(dct)
-    
+        self.get_totals()
+
     def get_url_begins_an_overlap(self):
-        for user in self._users:
-            for log in user.logs:
-                if log.url in self._overlapping_urls:
-                    dct = {log.url: "yes"}
-                    if dct not in self._url_begins_an_overlap.items():
-                        self._url_begins_an_overlap.update(dct)
-    
+        self.get_totals()
+
     def get_url_is_involved_in_an_overlap(self):
-        for user in self._users:
-            for log in user.logs:
-                if log.url in self._all_urls_in_overlaps:
-                    dct = {log.url: "yes"}
-                    if dct not in self._url_is_involved_in_an_overlap.items():
-                        self._url_is_involved_in_an_overlap.update(dct)
+        self.get_totals()
 
     def get_most_common_url_that_begins_an_overlap(self):
-        self._most_common_url_that_begins_an_overlap = mode(self._overlapping_urls)
-
+        self.get_totals()
 
     def get_avg_overlap_duration(self):
-        durations = []
-        for overlap in self._overlaps:
-            durations.append(overlap.duration)
-        self._avg_overlap_duration = round((sum(durations) / len(durations)), 2)
+        self.get_totals()
 
     def get_avg_time_before_overlap_starts(self):
-        durations = []
-        for overlap in self._overlaps:
-            durations.append(overlap.time_before_overlap_starts)
-        self._avg_time_before_overlap_starts = round((sum(durations) / len(durations)), 2)
+        self.get_totals()
 
     def get_avg_time_between_overlaps(self):
-        durations = []
-        for user in self._users:
-            if 0 < len(user.overlaps):
-                if user.avg_time_between_overlaps is not None:
-                    durations.append(user.avg_time_between_overlaps)
-        if 0 < len(durations):
-            self._avg_time_between_overlaps = round((sum(durations) / len(durations)), 2)
-    
+        self.get_totals()
+
     def get_avg_num_urls_per_overlaps(self):
-        avg_nums = []
-        for overlap in self._overlaps:
-            avg_nums.append(overlap.num_urls)
-        self._avg_num_urls_per_overlaps = round((sum(avg_nums) / len(avg_nums)), 2)
+        self.get_totals()
 
 
     @property
     def overlaps(self):
+        self.get_totals()
         return self._overlaps
     @property
     def all_urls_in_overlaps(self):
+        self.get_totals()
         return self._all_urls_in_overlaps
     @property
     def overlapping_urls(self):
+        self.get_totals()
         return self._overlapping_urls
 
     @property
     def avg_dload_time_per_url(self):
+        self.get_totals()
         return self._avg_dload_time_per_url
     @property
     def num_times_dloaded_per_url(self):
+        self.get_totals()
         return self._num_times_dloaded_per_url
     @property
     def url_is_involved_in_an_overlap(self):
+        self.get_totals()
         return self._url_is_involved_in_an_overlap
     @property
     def url_begins_an_overlap(self):
+        self.get_totals()
         return self._url_begins_an_overlap
 
     @property
     def avg_overlap_duration(self):
+        self.get_totals()
         return self._avg_overlap_duration
     @property
     def avg_time_before_overlap_starts(self):
+        self.get_totals()
         return self._avg_time_before_overlap_starts
     @property
     def avg_time_between_overlaps(self):
+        self.get_totals()
         return self._avg_time_between_overlaps
     @property
     def avg_num_urls_per_overlaps(self):
+        self.get_totals()
         return self._avg_num_urls_per_overlaps
     @property
     def most_common_url_that_begins_an_overlap(self):
+        self.get_totals()
         return self._most_common_url_that_begins_an_overlap
-
-
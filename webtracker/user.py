@@ -1,28 +1,36 @@
+from intervals import DownloadIndex
 from overlap import Overlap
-from statistics import multimode, mode
-from numpy import mean
+from sweep import find_overlap_groups
+from statistics import fmean, multimode, mode
 import collections
-import copy
 
 class User():
-    """User objects are groups of sessions associated with a particular userid."""
+    """User objects are groups of sessions associated with a particular userid.
+
+    Every metric is computed on first access of its property and cached; the get_* methods compute (or recompute)
+    one metric, reading the others through their properties so dependencies are resolved in any order. Metrics
+    that do not apply (download percentages without downloads, overlap averages without overlaps) stay None.
+    """
 
     def __init__(self, sessions, userid):
         self._sessions = sessions
         self._userid = userid
-        self._logs = []
+        self._logs = None
+        self._num_logs = None
         self._browsing_time = None
-        self._starts = []
-        self._urls_visited = []
-        self._dloads = []
-        self._urls_in_dloads = []
+        self._starts = None
+        self._urls_visited = None
+        self._dloads = None
+        self._dload_index = None
+        self._urls_in_dloads = None
         self._percent_dloads = None
-        self._avg_dload_time_per_session = []
+        self._avg_dload_time_per_session = None
         self._avg_session_time = None
-        self._avg_dload_time_per_url = []
-        self._overlaps = []
+        self._avg_dload_time_per_url = None
+        self._url_stats = None
+        self._overlaps = None
         self._percent_overlaps = None
-        self._avg_num_urls_per_overlaps = []
+        self._avg_num_urls_per_overlaps = None
         self._avg_overlap_time = None
         self._avg_time_between_overlaps = None
         self._avg_time_before_overlap_starts = None
@@ -36,163 +44,90 @@ class User():
         return ret_str
 
     def get_logs(self):
-        for session in self._sessions:
-            for log in session.logs:
-                self._logs.append(log)
-        self._logs = sorted(self._logs, key=lambda val: (val.timestamp))
+        self._logs = sorted((log for session in self._sessions for log in session.logs), key=lambda val: (val.timestamp))
+
+    def get_num_logs(self):
+        self._num_logs = sum(len(session.logs) for session in self._sessions)
 
     def get_browsing_time(self):
-        self._browsing_time = max(log.timestamp for log in self._logs) - min(log.timestamp for log in self._logs)
+        # Sessions know their first and last timestamps, so the user's logs never need sorting for this.
+        self._browsing_time = max(session.end for session in self._sessions) - min(session.start for session in self._sessions)
 
     def get_starts(self):
-        for session in self._sessions:
-            for log in session._session_logs:
-                if 1 == log.status:
-                    self._starts.append(log)
+        self._starts = [log for session in self._sessions for log in session.logs if 1 == log.status]
 
     def get_all_urls_visited(self):
-        for session in self._sessions:
-            if session.url not in self._urls_visited:
-                self._urls_visited.append(session.url)
+        self._urls_visited = list(dict.fromkeys(session.url for session in self._sessions))
 
     def get_dloads(self):
-        for session in self._sessions:
-            for download in session.downloads:
-                self._dloads.append(download)
-        self._dloads = sorted(self._dloads, key=lambda val: (val.end, val.start))
+        self._dloads = sorted((download for session in self._sessions for download in session.downloads), key=lambda val: (val.end, val.start))
+
+    def get_dload_index(self):
+        self._dload_index = DownloadIndex(self.dloads)
 
     def get_percent_dloads(self):
-        self._percent_dloads = (len(self._dloads) *2 / len(self._logs) *100)
+        if self.dloads:
+            self._percent_dloads = (len(self.dloads) *2 / self.num_logs *100)
 
     def get_urls_in_dloads(self):
-        self._urls_in_dloads = [dload.url for dload in self._dloads if dload.url not in self._urls_in_dloads]
+        self._urls_in_dloads = list(dict.fromkeys(dload.url for dload in self.dloads))
 
     def get_avg_dload_time_per_session(self):
-        for session in self._sessions:
-            if session.avg_dload_time is not None:
-                dct = {"Session H_ash" : session.hash, "Average dload time" : session.avg_dload_time}
-                self._avg_dload_time_per_session.append(dct)
+        self._avg_dload_time_per_session = [{"Session H_ash" : session.hash, "Average dload time" : session.avg_dload_time}
+            for session in self._sessions if session.avg_dload_time is not None]
 
     def get_avg_session_time(self):
         if 0 < len(self._sessions):
             self._avg_session_time = (sum(session.duration for session in self._sessions) / len(self._sessions))
 
     def get_avg_dload_time_per_url(self):
-        for url in self._urls_visited:
-            avg_times = collections.defaultdict(list)
-            for session in self._sessions:
-                if url == session.url and session.avg_dload_time != None: # changed this conditional a little
-                        avg_times[url].append(session.avg_dload_time)
-
-            for url, times in avg_times.items():
-                dct = {"URL" : url, "Average dload time" : mean(times)}
-                self._avg_dload_time_per_url.append(dct)
+        avg_times = collections.defaultdict(list)
+        for session in self._sessions:
+            if session.avg_dload_time != None: # changed this conditional a little
+                avg_times[session.url].append(session.avg_dload_time)
+        self._avg_dload_time_per_url = [{"URL" : url, "Average dload time" : fmean(avg_times[url])}
+            for url in self.urls_visited if url in avg_times]
 
     
-    def get_overlaps(self):
-
-        idx = 0
-        prev_overlaps = {}
-        total_overlaps = {}
- 
-        try:
-            starting_dload = self._dloads[idx]
-            ending_dload = self._dloads[idx]
-            greatest_end = starting_dload.end
-
-            while True:
-
-                try:
-                    curr_overlaps = {}
-
-                    for dload in self._dloads[idx +1:]:
-                        if starting_dload.start < dload.start <= ending_dload.end:
-                            curr_overlaps[dload] = dload.end
-                        
-                    if 2 > len(prev_overlaps) and 2 > len(curr_overlaps): # No previous and no current
-                        if idx == len(self._dloads) - 1:
-                            break
-                        else: # idx != len(self._dloads) - 1:
-                            idx += 1
-                            starting_dload = self._dloads[idx]
-                            ending_dload = self._dloads[idx]
-
-                    elif 2 > len(prev_overlaps) and 2 <= len(curr_overlaps): # No previous but current
-                        greatest_end = max(curr_overlaps.values())
-                        i = len(list(curr_overlaps.values())) - list(curr_overlaps.values())[::-1].index(greatest_end) - 1 # last occurence of max value
-                        target_dload = list(curr_overlaps.keys())[i]
-
-                        if idx == len(self._dloads) - 1:
-                            self._overlaps.append(Overlap(self, starting_dload, list(total_overlaps.keys()), target_dload))  
-                            break
-                        else: # idx != len(self._dloads) - 1:
-                            for dload in curr_overlaps:
-                                if dload not in total_overlaps:
-                                    total_overlaps[dload] = dload.end
-                            idx += 1
-                            ending_dload = self._dloads[idx]
-
-                    elif 2 <= len(prev_overlaps) and 2 > len(curr_overlaps): # Previous but no current
-                        greatest_end = max(total_overlaps.values())
-                        i = len(list(total_overlaps.values())) - list(total_overlaps.values())[::-1].index(greatest_end) - 1
-                        target_dload = list(total_overlaps.keys())[i]
-                        self._overlaps.append(Overlap(self, starting_dload, list(total_overlaps.keys()), target_dload))
-
-                        if idx == len(self._dloads) - 1:
-                            break
-                        else: # idx != len(self._dloads) - 1:
-                            total_overlaps.clear()
-                            idx += 1
-                            starting_dload = self._dloads[idx]
-
-                    elif 2 <= len(prev_overlaps) and 2 <= len(curr_overlaps): # Both previous and current:
-                        greatest_end = max(total_overlaps.values())
-                        i = len(list(total_overlaps.values())) - list(total_overlaps.values())[::-1].index(greatest_end) - 1 # last occurence of max value
-                        target_dload = list(total_overlaps.keys())[i]
-                        
-                        if idx == len(self._dloads) - 1:                
-                            self._overlaps.append(Overlap(self, starting_dload, list(total_overlaps.keys()), target_dload))
-                            break
-                        else: # idx != len(self._dloads) - 1:
-                            for dload in curr_overlaps:
-                                if dload not in total_overlaps:
-                                    total_overlaps[dload] = dload.end
-                            idx += 1
-                            ending_dload = self._dloads[idx]
+    def get_url_stats(self):
+        """Counts the downloads and collects the average download times of each url, as {url: [num_dloads, avg_dload_times]}."""
+        self._url_stats = {}
+        for session in self._sessions:
+            stats = self._url_stats.setdefault(session.url, [0, []])
+            stats[0] += len(session.downloads)
+            if session.avg_dload_time is not None:
+                stats[1].append(session.avg_dload_time)
 
-                    prev_overlaps = copy.deepcopy(curr_overlaps)
+    def get_overlaps(self):
+        self._overlaps = [Overlap(self, start, overlapping_starts, end) for start, overlapping_starts, end in find_overlap_groups(self.dloads, self.dload_index)]
 
-                except IndexError:
-                    break
-        except IndexError:
-            pass
-    
+    def get_overlaps_between(self, start, end):
+        """Returns the overlaps that are in progress at some point within [start, end]."""
+        return [overlap for overlap in self.overlaps if overlap.overlap_start <= end and start <= overlap.overlap_end]
     
     def get_percent_overlaps(self):
-        overlap_logs = 0
-        for overlap in self._overlaps:
-            overlap_logs += len(overlap.overlapping_starts) + 1
-        self._percent_overlaps = (overlap_logs / len(self._logs) *100)
+        if self.overlaps:
+            overlap_logs = 0
+            for overlap in self.overlaps:
+                overlap_logs += len(overlap.overlapping_starts) + 1
+            self._percent_overlaps = (overlap_logs / self.num_logs *100)
 
-    def get_avg_num_urls_per_overlaps(self): 
-        self._avg_num_urls_per_overlaps = (sum(overlap.num_urls for overlap in self._overlaps) / len(self._overlaps))
+    def get_avg_num_urls_per_overlaps(self):
+        if self.overlaps:
+            self._avg_num_urls_per_overlaps = (sum(overlap.num_urls for overlap in self.overlaps) / len(self.overlaps))
 
     def get_avg_overlap_time(self):
-        self._avg_overlap_time = (sum(overlap.duration for overlap in self._overlaps) / len(self._overlaps))
+        if self.overlaps:
+            self._avg_overlap_time = (sum(overlap.duration for overlap in self.overlaps) / len(self.overlaps))
 
     def get_avg_time_between_overlaps(self):
-        times_between_overlaps = []
-        idx = 0
-        if 2 <= len(self._overlaps):
-            while True:
-                if idx == len(self._overlaps) - 1:
-                    break
-                times_between_overlaps.append(self._overlaps[idx+1].overlap_start - self._overlaps[idx].overlap_end)
-                idx += 1
+        if 2 <= len(self.overlaps):
+            times_between_overlaps = [overlap.overlap_start - prev_overlap.overlap_end for prev_overlap, overlap in zip(self.overlaps, self.overlaps[1:])]
             self._avg_time_between_overlaps = (sum(times_between_overlaps) / len(times_between_overlaps))
 
     def get_avg_time_before_overlap_starts(self):
-        self._avg_time_before_overlap_starts = (sum(overlap.time_before_overlap_starts for overlap in self._overlaps) / len(self._overlaps))
+        if self.overlaps:
+            self._avg_time_before_overlap_starts = (sum(overlap.time_before_overlap_starts for overlap in self.overlaps) / len(self.overlaps))
     
     def get_visualized_overlaps(self):
         pass
@@ -205,51 +140,98 @@ class User():
         return self._userid
     @property
     def logs(self):
+        if self._logs is None:
+            self.get_logs()
         return self._logs
     @property
+    def num_logs(self):
+        if self._num_logs is None:
+            self.get_num_logs()
+        return self._num_logs
+    @property
     def browsing_time(self):
+        if self._browsing_time is None:
+            self.get_browsing_time()
         return self._browsing_time
     @property
     def starts(self):
+        if self._starts is None:
+            self.get_starts()
         return self._starts
     @property
     def urls_visited(self):
+        if self._urls_visited is None:
+            self.get_all_urls_visited()
         return self._urls_visited
     @property
     def dloads(self):
+        if self._dloads is None:
+            self.get_dloads()
         return self._dloads
     @property
+    def dload_index(self):
+        if self._dload_index is None:
+            self.get_dload_index()
+        return self._dload_index
+    @property
     def percent_dloads(self):
+        if self._percent_dloads is None:
+            self.get_percent_dloads()
         return self._percent_dloads
     @property
     def urls_in_dloads(self):
+        if self._urls_in_dloads is None:
+            self.get_urls_in_dloads()
         return self._urls_in_dloads
     @property
     def avg_dload_time_per_session(self):
+        if self._avg_dload_time_per_session is None:
+            self.get_avg_dload_time_per_session()
         return self._avg_dload_time_per_session
     @property
     def avg_session_time(self):
+        if self._avg_session_time is None:
+            self.get_avg_session_time()
         return self._avg_session_time
     @property
     def avg_dload_time_per_url(self):
+        if self._avg_dload_time_per_url is None:
+            self.get_avg_dload_time_per_url()
         return self._avg_dload_time_per_url
     @property
+    def url_stats(self):
+        if self._url_stats is None:
+            self.get_url_stats()
+        return self._url_stats
+    @property
     def overlaps(self):
+        if self._overlaps is None:
+            self.get_overlaps()
         return self._overlaps
     @property
     def percent_overlaps(self):
+        if self._percent_overlaps is None:
+            self.get_percent_overlaps()
         return self._percent_overlaps
     @property
     def avg_num_urls_per_overlaps(self):
+        if self._avg_num_urls_per_overlaps is None:
+            self.get_avg_num_urls_per_overlaps()
         return self._avg_num_urls_per_overlaps
     @property
     def avg_overlap_time(self):
+        if self._avg_overlap_time is None:
+            self.get_avg_overlap_time()
         return self._avg_overlap_time
     @property
     def avg_time_between_overlaps(self):
+        if self._avg_time_between_overlaps is None:
+            self.get_avg_time_between_overlaps()
         return self._avg_time_between_overlaps
     @property
     def avg_time_before_overlap_starts(self):
+        if self._avg_time_before_overlap_starts is None:
+            self.get_avg_time_before_overlap_starts()
         return self._avg_time_before_overlap_starts
     @property
     def visualized_overlaps(self):
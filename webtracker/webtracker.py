@@ -1,113 +1,232 @@
-from log import Log
+from cache import LogCache
+from checkpoint import Checkpoint
+from live import REORDER_WINDOW, LiveTracker, LogFollower
+from server import BeaconServer
+from log import Log, WEBTRACKER_BYTES_RE, parse_log_line
+from logtable import extract_downloads
 from user import User
 from session import Session
-from totals import Totals
-from graph import Graph
+from summary import UserSummary
+from totals import PartialTotals, Totals
+from profiler import Profiler, UserSteps
+from export import select_columns, write_rows
+from plan import METRICS, OUTPUTS, STAGES, MetricPlan
 from argparse import ArgumentParser
-import re
+import asyncio
+import cProfile
+import bz2
+import glob
+import gzip
+import heapq
+import lzma
+import mmap
+import os
+import time
 import collections
-from collections import defaultdict
+import functools
 from tqdm import tqdm
-from dash import Dash
-from multiprocessing import Process, cpu_count, Manager
-import copy
+from multiprocessing import Pool, cpu_count, get_all_start_methods, get_context
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
-def get_sublists(original_list, number_of_sub_list_wanted):
-    sublists = list()
-    for sub_list_count in range(number_of_sub_list_wanted): 
-        sublists.append(original_list[sub_list_count::number_of_sub_list_wanted])
-    return copy.deepcopy(sublists)
+# Magic numbers of the compressed formats logrotate produces.
+COMPRESSED_OPENERS = {
+    b"\x1f\x8b": gzip.open,
+    b"BZh": bz2.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
 
+# Seconds to sleep when no followed file has new lines, and users listed per follow-mode report.
+FOLLOW_POLL_INTERVAL = 0.5
+LIVE_REPORT_USERS = 10
 
-def generate_user_logs(logs):
-    """ Initializes Session objects and returns a list of User objects [corresponding to Sessions]."""
+# Users grouped in the parent process; forked workers inherit them instead of receiving pickled copies.
+_USERS = []
+
+PSTATS_EXTENSIONS = (".prof", ".pstats")
+
+# Per-step timings of generate_user_info, set only while profiling; forked workers inherit it and start their own.
+_USER_STEPS = None
+
+# Number of chunks of roughly equal work each worker should get, so that heavy users do not stall the pool.
+CHUNKS_PER_WORKER = 8
+
+# Dashboard pages only add the one-bar-per-row graphs for tables up to this many rows.
+FULL_GRAPH_MAX_ROWS = 500
+
+
+def get_work_size(user):
+    """Estimates the cost of analysing a user from their number of downloads."""
+    return 1 + sum(len(session.downloads) for session in user.sessions)
+
+def get_user_chunks(users, num_workers):
+    """Returns contiguous ranges of user indices of roughly equal work, heaviest chunks first.
+
+    Chunks keep the users in order so their PartialTotals, merged by first index, add URLs and overlap counts in the
+    same order as a serial run; a heavy user closes its chunk early, so it still lands in a chunk of its own.
+    """
+    total_work = sum(get_work_size(user) for user in users)
+    chunk_work = max(1, total_work // (num_workers * CHUNKS_PER_WORKER))
+    chunks = []
+    chunk = []
+    work = 0
+    for idx, user in enumerate(users):
+        chunk.append(idx)
+        work += get_work_size(user)
+        if chunk_work <= work:
+            chunks.append((work, chunk))
+            chunk = []
+            work = 0
+    if chunk:
+        chunks.append((work, chunk))
+    return [chunk for work, chunk in sorted(chunks, key=lambda val: -val[0])]
+
+
+def group_user_sessions(logs):
+    """Groups logs into populated Session objects and returns one User object per userid."""
     sessions = {}
-    users = []
+    user_sessions = {}
 
     for log in tqdm(logs, desc='Assigning logs to users'):
-        if log.userid not in users:
-            users.append(log.userid)
         try:
-            sessions[log.session_hash].add_log(log)
-        except Exception as e:
-            sessions[log.session_hash] = Session(log.session_hash)
-            sessions[log.session_hash].add_log(log)
-
-    sessions = list(sessions.values())
-    for session in tqdm(sessions, desc='Populating user sessions'):
-        session.sort_logs()
-        session.get_downloads()
-        session.get_avg_dload_time()
-        session.get_duration()
-
-    user_dct = {}
-    for user in users:
-        session_lst = []
-        for session in sessions:
-            if user == session.userid:
-                session_lst.append(session)
-        user_dct[user] = User(session_lst, user)
-    users = list(user_dct.values())
+            sessions[log.session_key].add_log(log)
+        except KeyError:
+            session = sessions[log.session_key] = Session(log.session_key)
+            session.add_log(log)
+            user_sessions.setdefault(log.userid, []).append(session)
 
-    num_proc = cpu_count()
-    print(f"CPU Count: {num_proc}")
-    users_manager = Manager()
-    ret_users = users_manager.list()
-    procs = []
+    extract_downloads(list(sessions.values()))
 
-    sub_users = get_sublists(users, num_proc)
+    return [User(session_lst, userid) for userid, session_lst in user_sessions.items()]
 
-    for sub_user in sub_users:
-        proc = Process(target=generate_user_info, args=(sub_user, ret_users))
-        procs.append(proc)
-        proc.start()
 
-    for proc in procs:
-        proc.join()
+def generate_user_logs(logs, num_workers=None, profiler=None, stages=STAGES):
+    """ Initializes Session objects and returns a UserSummary for each User [corresponding to Sessions] with their PartialTotals.
+
+    Users are analysed by a pool of num_workers processes (cpu_count() by default), or serially in this
+    process when num_workers is 0. Each chunk of users comes back with its own PartialTotals, and those are
+    merged here so the totals never need another pass over the users. Stages are recorded in profiler if given.
+    Only the analysis stages of generate_user_info in stages are run (see MetricPlan).
+    """
+    if profiler is None:
+        profiler = Profiler()
+    # Logs are streamed into the grouping, so the time spent producing them is split out as its own stage.
+    with profiler.stage("group_user_sessions") as stage:
+        users = group_user_sessions(profiler.iter_timed("parse_logs", logs))
+        stage["items"] = len(users)
+    with profiler.stage("generate_user_info") as stage:
+        stage["items"] = len(users)
+        return summarize_all_users(users, num_workers, profiler, stages)
+
+
+def summarize_all_users(users, num_workers, profiler, stages=STAGES):
+    global _USERS
+    if num_workers is None:
+        num_workers = cpu_count()
+    if 0 == num_workers:
+        summaries = summarize_users(tqdm(users, desc='Populating user information'), stages)
+        return summaries, PartialTotals.from_users(summaries)
+
+    print(f"Workers: {num_workers}")
+    summaries = [None] * len(users)
+    partials = {}
+    chunks = get_user_chunks(users, num_workers)
+
+    if "fork" in get_all_start_methods():
+        _USERS = users
+        pool = get_context("fork").Pool(num_workers)
+        results = pool.imap_unordered(functools.partial(summarize_inherited_users, stages=stages), chunks)
+    else:
+        pool = Pool(num_workers)
+        results = pool.imap_unordered(functools.partial(summarize_indexed_users, stages=stages), [[(idx, users[idx]) for idx in chunk] for chunk in chunks])
+
+    with pool, tqdm(total=len(users), desc='Populating user information') as progress:
+        for indexed_summaries, partial, user_steps in results:
+            for idx, summary in indexed_summaries:
+                summaries[idx] = summary
+            partials[indexed_summaries[0][0]] = partial
+            if user_steps is not None:
+                profiler.add_user_steps(user_steps)
+            progress.update(len(indexed_summaries))
+    _USERS = []
 
     print("Processes Joined")
-        
-    return ret_users
-
-
-def generate_user_info(users, ret_users):
-    for user in tqdm(users, desc='Populating user information'):
-        user.get_logs()
-        user.get_browsing_time()
-        user.get_starts()
-        user.get_all_urls_visited()
-        user.get_dloads()
-        user.get_avg_dload_time_per_session()
-        user.get_avg_session_time()
-        if 0 < len(user.dloads):
-            user.get_percent_dloads()
-            user.get_urls_in_dloads()
-            user.get_overlaps()
-            for dload in user.dloads:
-                dload.get_duration()
-        if 0 < len(user.overlaps):
-            for overlap in user.overlaps:
-                overlap.get_overlap_start()
-                overlap.get_overlap_end()
-                overlap.get_duration()
-                overlap.get_time_before_overlap_starts()
-                overlap.get_overlapping_url()
-                overlap.get_overlapped_url()
-                overlap.get_urls()
-                overlap.get_num_urls()
-            user.get_percent_overlaps()
-            user.get_avg_overlap_time()
-            user.get_avg_num_urls_per_overlaps()
-            user.get_avg_time_between_overlaps()
-            user.get_avg_time_before_overlap_starts()
-            #print("   Getting visualized overlaps...")
-            #user.get_visualized_overlaps()
-
-        print_overlaps(user)
-
-    ret_users.extend(users)
+
+    # Merge in user order so URL ordering and most_common ties match a serial run, whichever worker finished first.
+    partial = PartialTotals()
+    for key in sorted(partials):
+        partial.merge(partials[key])
+    return summaries, partial
+
+
+def summarize_users(users, stages=STAGES):
+    """Computes the metrics of each user and returns them as compact UserSummary records."""
+    summaries = []
+    for user in users:
+        generate_user_info(user, stages)
+        summaries.append(UserSummary(user, stages))
+        if _USER_STEPS is not None:
+            _USER_STEPS.add_user_counts(summaries[-1])
+    return summaries
+
+def summarize_indexed_users(indexed_users, stages=STAGES):
+    """Worker entry point: summarizes (index, User) pairs and returns (index, UserSummary) pairs with their PartialTotals,
+    and the UserSteps of this chunk when profiling."""
+    global _USER_STEPS
+    user_steps = None
+    if _USER_STEPS is not None:
+        user_steps = _USER_STEPS = UserSteps()
+    summaries = summarize_users((user for idx, user in indexed_users), stages)
+    return [(idx, summary) for (idx, user), summary in zip(indexed_users, summaries)], PartialTotals.from_users(summaries), user_steps
+
+def summarize_inherited_users(indices, stages=STAGES):
+    """Worker entry point for forked processes: summarizes the inherited users at the given indices."""
+    return summarize_indexed_users([(idx, _USERS[idx]) for idx in indices], stages)
+
+
+def call_step(func, *args):
+    return func(*args)
+
+def generate_user_info(user, stages=STAGES):
+    """Computes the metrics a UserSummary holds, in dependency order so the profiler sees each step on its own.
+
+    Every metric is also a cached property, so skipping this only moves the work to first access; metrics the
+    summary does not hold (the time-sorted log list, starts, per-session download tables) are never computed.
+    The download durations and the overlaps are only computed when their stage is in stages.
+    """
+    step = call_step if _USER_STEPS is None else functools.partial(_USER_STEPS.time_step, user)
+    step(user.get_num_logs)
+    step(user.get_browsing_time)
+    step(user.get_all_urls_visited)
+    step(user.get_avg_session_time)
+    if "dloads" not in stages:
+        return
+    step(user.get_dloads)
+    if 0 < len(user.dloads):
+        step(user.get_percent_dloads)
+        if "overlaps" in stages:
+            step(user.get_dload_index)
+            step(user.get_overlaps)
+        for dload in user.dloads:
+            step(dload.get_duration)
+    if "overlaps" not in stages:
+        return
+    if 0 < len(user.overlaps):
+        for overlap in user.overlaps:
+            # The getters of Overlap.get_metrics, one step each.
+            for get_metric in (overlap.get_overlap_start, overlap.get_overlap_end, overlap.get_duration,
+                    overlap.get_time_before_overlap_starts, overlap.get_overlapping_url, overlap.get_overlapped_url,
+                    overlap.get_urls, overlap.get_num_urls):
+                step(get_metric)
+        step(user.get_percent_overlaps)
+        step(user.get_avg_overlap_time)
+        step(user.get_avg_num_urls_per_overlaps)
+        step(user.get_avg_time_between_overlaps)
+        step(user.get_avg_time_before_overlap_starts)
+        #print("   Getting visualized overlaps...")
+        #user.get_visualized_overlaps()
+
+    step(print_overlaps, user)
 
 def print_overlaps(user):
     overlaps = collections.defaultdict(list)
@@ -121,83 +240,154 @@ def print_overlaps(user):
                 print(f"  OVERLAP END:   {overlap.end.start} {overlap.end.end} {overlap.end.url}\n")
 
 def get_user_axes(users):
+    """Returns the user data fields and a generator of one row per user, in field order."""
     user_fields = ['user', 'num_logs', 'browsing_time (hrs)', 'num_sessions', 'avg_session_time (hrs)', 'num_dloads', 'percent_dloads',
         'num_urls_visited', 'num_overlaps', 'percent_overlaps', 'avg_overlap_duration (secs)', 'avg_time_between_overlaps (mins)', 'avg_num_urls_per_overlap']
 
-    user_rows = []
-    for user in tqdm(users, desc='Populating user data CSV'):
-        user_dct = {
-
-            "user" : user.id, # -------------------------------------------------------------------------- # User ID
-            "num_logs" : len(user.logs), # --------------------------------------------------------------- # How many logs per user
-            "browsing_time (hrs)" : ms_to_hours(user.browsing_time), # ----------------------------------- # Duration of first timestamp to last timestamp of user logs
-            "num_sessions" : len(user.sessions), # ------------------------------------------------------- # How many sessions per user (logs with same URL and TABID)
-            "avg_session_time (hrs)" : ms_to_hours(user.avg_session_time), # ------------------------------# Average time a session lasts
-            "num_dloads" : len(user.dloads), # ----------------------------------------------------------- # How many downloads per user (status 1 log with corresponding status 2 log)
-            "percent_dloads" : user.percent_dloads, # ---------------------------------------------------- # What percent of user logs are downloads
-            "num_urls_visited" : len(user.urls_visited), # ----------------------------------------------- # Number of unique websites visited per user
-            "num_overlaps" : len(user.overlaps), # ------------------------------------------------------- # Number of overlaps per user
-            "percent_overlaps" : user.percent_overlaps, # ------------------------------------------------ # What percent of user logs involve an overlap
-            "avg_overlap_duration (secs)" : ms_to_seconds(user.avg_overlap_time), # ---------------------- # Average time an overlap lasts
-            "avg_time_between_overlaps (mins)" : ms_to_minutes(user.avg_time_between_overlaps), # -------- # Average time between overlaps
-            "avg_num_urls_per_overlap" : user.avg_num_urls_per_overlaps, # ------------------------------- # Average number of URLs involved in overlap
-        }   
-        user_rows.append(user_dct)
-
-    return user_fields, user_rows
+    def iter_rows():
+        for user in tqdm(users, desc='Populating user data'):
+            yield (
+                user.id, # ------------------------------------------------------ # User ID
+                user.num_logs, # ------------------------------------------------ # How many logs per user
+                ms_to_hours(user.browsing_time), # ------------------------------ # Duration of first timestamp to last timestamp of user logs
+                user.num_sessions, # -------------------------------------------- # How many sessions per user (logs with same URL and TABID)
+                ms_to_hours(user.avg_session_time), # --------------------------- # Average time a session lasts
+                len(user.dloads), # --------------------------------------------- # How many downloads per user (status 1 log with corresponding status 2 log)
+                user.percent_dloads, # ------------------------------------------ # What percent of user logs are downloads
+                len(user.urls_visited), # --------------------------------------- # Number of unique websites visited per user
+                len(user.overlaps), # ------------------------------------------- # Number of overlaps per user
+                user.percent_overlaps, # ---------------------------------------- # What percent of user logs involve an overlap
+                ms_to_seconds(user.avg_overlap_time), # ------------------------- # Average time an overlap lasts
+                ms_to_minutes(user.avg_time_between_overlaps), # ---------------- # Average time between overlaps
+                user.avg_num_urls_per_overlaps or None, # ----------------------- # Average number of URLs involved in overlap
+            )
+
+    return user_fields, iter_rows()
 
 
 def get_url_axes(totals):
+    """Returns the unique URL data fields and a generator of one row per URL, in field order."""
     url_fields = ['url', 'num_times_dloaded', 'avg_dload_time (secs)', 'involved_in_an_overlap', 'begins_an_overlap']
-    url_rows = defaultdict(list)
-    for d in (totals.num_times_dloaded_per_url, totals.avg_dload_time_per_url, totals.url_is_involved_in_an_overlap, totals.url_begins_an_overlap):
-        for key, value in d.items():
-            if value:
-                url_rows[key].append(value)
+    columns = (totals.num_times_dloaded_per_url, totals.avg_dload_time_per_url, totals.url_is_involved_in_an_overlap, totals.url_begins_an_overlap)
+
+    def iter_rows():
+        for url in dict.fromkeys(url for column in columns for url in column):
+            yield (url, *(column.get(url) for column in columns))
 
-    return url_fields, url_rows
+    return url_fields, iter_rows()
 
 
 def get_dload_axes(users):
+    """Returns the download data fields and a generator of one row per download, in field order."""
     dload_fields = ['url', 'user_who_downloaded', 'dload_duration (secs)']
-    dload_rows = []
-    for user in tqdm(users, desc='Populating download data CSV'):
-        for dload in user.dloads:
-            dload_dct = {
-                "url" : dload.url, # -------------------------------------------- # Downloaded URL
-                "user_who_downloaded" : user.id, # ------------------------------ # User who did the download
-                "dload_duration (secs)" : ms_to_seconds(dload.duration), # ------ # Overlap duration
-            }   
-            dload_rows.append(dload_dct)
-
-    return dload_fields, dload_rows
+
+    def iter_rows():
+        for user in tqdm(users, desc='Populating download data'):
+            for dload in user.dloads:
+                yield (
+                    dload.url, # ------------------------------ # Downloaded URL
+                    user.id, # -------------------------------- # User who did the download
+                    ms_to_seconds(dload.duration), # ---------- # Download duration
+                )
+
+    return dload_fields, iter_rows()
     
 
 def get_total_overlap_axes(totals):
+    """Returns the total overlap data fields and a one-row list."""
     overlap_fields = ['avg_time_between_overlaps (mins)', 'avg_overlap_duration (secs)', 'avg_time_before_overlap_starts (secs)',
     'avg_num_urls_per_overlaps', 'most_common_url_that_begins_an_overlap']
 
-    overlap_rows = [ms_to_minutes(totals.avg_time_between_overlaps), ms_to_seconds(totals.avg_overlap_duration),
-    ms_to_seconds(totals.avg_time_before_overlap_starts), totals.avg_num_urls_per_overlaps, totals.most_common_url_that_begins_an_overlap]
+    overlap_rows = [(ms_to_minutes(totals.avg_time_between_overlaps), ms_to_seconds(totals.avg_overlap_duration),
+    ms_to_seconds(totals.avg_time_before_overlap_starts), totals.avg_num_urls_per_overlaps, totals.most_common_url_that_begins_an_overlap)]
 
     return overlap_fields, overlap_rows
 
 
 def get_overlap_axes(users):
+    """Returns the overlap data fields and a generator of one row per overlap, in field order."""
     overlap_fields = ['user_for_this_overlap', 'overlap_duration (secs)', 'time_before_overlap_starts (secs)', 'url_that_begins_the_overlap','num_urls_per_overlap']
-    overlap_rows = []
-    for user in tqdm(users, desc='Populating overlap data CSV'):
-        for overlap in user.overlaps:
-            overlap_dct = {
-                "user_for_this_overlap" : user.id, # ---------------------------------------------------------- # User ID
-                "overlap_duration (secs)" : ms_to_seconds(overlap.duration), # -------------------------------- # Overlap duration
-                "time_before_overlap_starts (secs)" : ms_to_seconds(overlap.time_before_overlap_starts), # ---- # Time before overlap starts
-                "url_that_begins_the_overlap" : overlap.overlapping_url, # ------------------------------------ # URL that begins the overlap
-                "num_urls_per_overlap" : overlap.num_urls # --------------------------------------------------- # Number of URLs per overlap #TODO
-            }   
-            overlap_rows.append(overlap_dct)
 
-    return overlap_fields, overlap_rows
+    def iter_rows():
+        for user in tqdm(users, desc='Populating overlap data'):
+            for overlap in user.overlaps:
+                yield (
+                    user.id, # ---------------------------------------------- # User ID
+                    ms_to_seconds(overlap.duration), # ---------------------- # Overlap duration
+                    ms_to_seconds(overlap.time_before_overlap_starts), # ---- # Time before overlap starts
+                    overlap.overlapping_url, # ------------------------------ # URL that begins the overlap
+                    overlap.num_urls # -------------------------------------- # Number of URLs per overlap
+                )
+
+    return overlap_fields, iter_rows()
+
+
+def get_output_axes(plan, output, fields, rows):
+    """Cuts the fields and rows of an output down to the columns the MetricPlan asks for."""
+    return select_columns(fields, rows, plan.get_columns(output, fields))
+
+
+def export_data(users, totals, export_dir, export_format, plan=None):
+    """Streams the data tables of the plan's outputs (all of them by default) to export_dir as CSV or Parquet,
+    one batch of rows at a time."""
+    if plan is None:
+        plan = MetricPlan()
+    os.makedirs(export_dir, exist_ok=True)
+    for output, name, get_axes, data in (
+            ("user", "user_data", get_user_axes, users),
+            ("url", "unique_url_data", get_url_axes, totals),
+            ("download", "download_data", get_dload_axes, users),
+            ("overlap", "overlap_data", get_overlap_axes, users),
+            ("total_overlap", "total_overlap_data", get_total_overlap_axes, totals)):
+        if plan.wants(output):
+            fields, rows = get_output_axes(plan, output, *get_axes(data))
+            write_rows(os.path.join(export_dir, f"{name}.{export_format}"), fields, rows)
+
+
+def serve_dashboard(users, totals, port, plan=None):
+    """Serves the data tables of the plan's outputs (all of them by default) in one multi-page app; each page and
+    its figures are built on first view."""
+    # Dash, plotly and pandas take longer to import than a whole parse of a small log, so only load them here.
+    from dash import Dash
+    from dashboard import Dashboard
+    from graph import Graph
+
+    if plan is None:
+        plan = MetricPlan()
+    app = Dash(__name__, external_stylesheets=external_stylesheets)
+    dashboard = Dashboard(app)
+    pages = (
+        ("user", "/", "Users", "users", get_user_axes, users, Graph.get_user_graphs),
+        ("url", "/urls", "Unique URLs", "urls", get_url_axes, totals, Graph.get_url_graphs),
+        ("download", "/downloads", "Downloads", "downloads", get_dload_axes, users, Graph.get_dload_graphs),
+        ("overlap", "/overlaps", "Overlaps", "overlaps", get_overlap_axes, users, Graph.get_overlap_graphs),
+    )
+
+    def get_page_builder(graph, get_full_graphs):
+        def build_page():
+            graph.get_aggregated_graphs()
+            graph.get_detail_table()
+            # One bar per row only stays usable for small tables, and the charts need every column.
+            if len(graph.df) <= FULL_GRAPH_MAX_ROWS and plan.metrics is None:
+                get_full_graphs(graph)
+            return graph.children
+        return build_page
+
+    for output, path, title, name, get_axes, data, get_full_graphs in pages:
+        if plan.wants(output):
+            graph = Graph.from_rows(*get_output_axes(plan, output, *get_axes(data)), app, name)
+            graph.init_callbacks()
+            dashboard.add_page(path, title, get_page_builder(graph, get_full_graphs))
+
+    if plan.wants("total_overlap"):
+        totals_graph = Graph.from_rows(*get_output_axes(plan, "total_overlap", *get_total_overlap_axes(totals)), app, "totals")
+        def build_totals_page():
+            totals_graph.get_summary_table()
+            return totals_graph.children
+        dashboard.add_page("/totals", "Totals", build_totals_page)
+
+    dashboard.init_app()
+    app.run(port=port, debug=False)
 
 
 def ms_to_hours(ms):
@@ -212,92 +402,276 @@ def ms_to_seconds(ms):
     if ms:
         return ms / 1000
 
+def get_opener(filename:str):
+    """Returns the decompressing open function for a gzip/bz2/xz file, or None for plain text."""
+    with open(filename, 'rb') as fp:
+        magic = fp.read(6)
+    for prefix, opener in COMPRESSED_OPENERS.items():
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+def iter_compressed_logs(filename:str, opener):
+    """Yields Log objects from a compressed file, decompressing one line at a time."""
+    with opener(filename, 'rt', errors='replace') as fp:
+        for line in fp:
+            log = parse_log_line(line)
+            if log is not None:
+                yield log
+
+def iter_mmap_logs(filename:str):
+    """Yields Log objects from a plain file by scanning it memory-mapped, decoding only the matched fields."""
+    with open(filename, 'rb') as fp:
+        if 0 == os.fstat(fp.fileno()).st_size:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for match in WEBTRACKER_BYTES_RE.finditer(mm):
+                yield Log([field.decode('utf-8', 'replace') for field in match.groups()])
+
+def iter_text_logs(filename:str):
+    """Yields Log objects one at a time so the whole log file is never held in memory."""
+    opener = get_opener(filename)
+    if opener is None:
+        yield from iter_mmap_logs(filename)
+    else:
+        yield from iter_compressed_logs(filename, opener)
+
+def iter_logs(filename:str, cache=None):
+    """Yields the Log objects of a file, from its columnar cache entry when a LogCache is given and it is fresh."""
+    if cache is None:
+        yield from iter_text_logs(filename)
+    else:
+        yield from cache.iter_logs(filename, iter_text_logs)
+
+def read_log_tail(filename:str, offset:int):
+    """Returns the Log objects after byte offset in a file and the offset to resume from next time.
+
+    Plain files are scanned memory-mapped up to their last complete line, so a line still being written is
+    picked up by the next run. Compressed files cannot be resumed and are read whole once.
+    """
+    opener = get_opener(filename)
+    size = os.stat(filename).st_size
+    if opener is not None:
+        if 0 < offset:
+            return [], offset
+        return list(iter_compressed_logs(filename, opener)), size
+    if size <= offset:
+        return [], offset
+    with open(filename, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = mm.rfind(b"\n", offset) + 1
+            if end <= offset:
+                return [], offset
+            logs = [Log([field.decode('utf-8', 'replace') for field in match.groups()])
+                for match in WEBTRACKER_BYTES_RE.finditer(mm, offset, end)]
+    return logs, end
+
+def read_new_logs(filenames, checkpoint):
+    """Returns the logs appended to each file since the checkpoint, recording the new offsets in it."""
+    log_lists = []
+    for filename in filenames:
+        logs, offset = read_log_tail(filename, checkpoint.get_offset(filename))
+        checkpoint.set_offset(filename, offset)
+        log_lists.append(logs)
+    if 1 == len(log_lists):
+        return log_lists[0]
+    return sorted((log for logs in log_lists for log in logs), key=lambda val: val.timestamp)
+
 def parse_logs(filename:str):
-    """Returns a list of parsed log_str objects, where each log_str object is a list of five strings."""
-    with open(filename, 'r') as fp:
-        log_strs = [log_str.replace("/WebTracker/", '').replace(" HTTP", '').split(':') for log_str in re.findall("/WebTracker/.*HTTP", fp.read())]
-        return [Log(log_str) for log_str in log_strs if 5 == len(log_str)]
+    """Returns a list of parsed Log objects."""
+    return list(iter_logs(filename))
+
+def parse_sorted_logs(filename:str, cache=None):
+    """Returns the parsed Log objects of one file ordered by timestamp."""
+    return sorted(iter_logs(filename, cache), key=lambda val: val.timestamp)
+
+def expand_log_paths(paths):
+    """Expands directories and glob patterns into a sorted list of log files."""
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            entries = sorted(os.path.join(path, entry) for entry in os.listdir(path) if not entry.startswith('.'))
+            filenames.extend(entry for entry in entries if os.path.isfile(entry))
+        elif glob.has_magic(path):
+            filenames.extend(entry for entry in sorted(glob.glob(path)) if os.path.isfile(entry))
+        else:
+            filenames.append(path)
+    return list(dict.fromkeys(filenames))
+
+def iter_log_files(filenames, num_workers=None, cache=None):
+    """Yields Log objects from every file, parsed in parallel and merged into one time-ordered stream."""
+    if 1 == len(filenames):
+        yield from iter_logs(filenames[0], cache)
+        return
+    if num_workers is None:
+        num_workers = cpu_count()
+    if 0 == num_workers:
+        log_lists = [parse_sorted_logs(filename, cache) for filename in filenames]
+    else:
+        with Pool(min(num_workers, len(filenames))) as pool:
+            log_lists = pool.map(functools.partial(parse_sorted_logs, cache=cache), filenames)
+    yield from heapq.merge(*log_lists, key=lambda val: val.timestamp)
+
+def print_live_report(report):
+    if report["window_end"] is None:
+        print("[live] waiting for logs")
+        return
+    print(f"\n[live] window {report['window_start']} - {report['window_end']}: {report['num_logs']} logs ({report['num_late_logs']} late), "
+        f"{report['active_users']} active users, {report['open_sessions']} open sessions")
+    print(f"  downloads: {report['num_dloads']}  overlaps: {report['num_overlaps']}  "
+        f"avg overlap duration (secs): {ms_to_seconds(report['avg_overlap_duration'])}  "
+        f"avg num urls per overlap: {report['avg_num_urls_per_overlap']}")
+    print(f"  most common url that begins an overlap: {report['most_common_url_that_begins_an_overlap']}")
+    for row in report["users"][:LIVE_REPORT_USERS]:
+        print(f"  USER: {row['user']}  downloads: {row['num_dloads']}  overlaps: {row['num_overlaps']}  "
+            f"avg overlap duration (secs): {ms_to_seconds(row['avg_overlap_duration'])}")
+
+def follow_logs(filenames, tracker, report_interval, poll_interval=FOLLOW_POLL_INTERVAL):
+    """Tails the log files like `tail -F`, feeding new logs to the LiveTracker and printing a report every report_interval seconds."""
+    followers = [LogFollower(filename) for filename in filenames]
+    next_report = time.monotonic() + report_interval
+    try:
+        while True:
+            idle = True
+            for follower in followers:
+                for line in follower.read_lines():
+                    idle = False
+                    log = parse_log_line(line)
+                    if log is not None:
+                        tracker.add_log(log)
+            if next_report <= time.monotonic():
+                print_live_report(tracker.get_report())
+                next_report = time.monotonic() + report_interval
+            if idle:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for follower in followers:
+            follower.close()
 
 def handle_args():
-    """Ensures logfile is passed in as argument."""
+    """Ensures at least one logfile, directory or glob is passed in as argument."""
     parser = ArgumentParser(description='Process Logs')
-    parser.add_argument("-l", "--log", dest="filename", required=True,
-                    help="input log file", metavar="FILE")
-    return parser.parse_args()
+    parser.add_argument("-l", "--log", dest="filenames", default=[], nargs='+',
+                    help="input log files, directories or glob patterns", metavar="FILE")
+    parser.add_argument("-w", "--workers", dest="workers", type=int, default=None,
+                    help="number of worker processes (default: CPU count, 0: run serially in this process)", metavar="N")
+    parser.add_argument("-s", "--state", dest="state", default=None,
+                    help="incremental mode: resume from and update this state file, processing only appended logs", metavar="FILE")
+    parser.add_argument("--idle-timeout", dest="idle_timeout", type=float, default=60,
+                    help="in incremental, follow and listen mode, close users idle for this many minutes (default: 60)", metavar="MINUTES")
+    parser.add_argument("-f", "--follow", dest="follow", action="store_true",
+                    help="follow the log files like tail -F and report live overlap metrics")
+    parser.add_argument("--window", dest="window", type=float, default=5,
+                    help="in follow and listen mode, the sliding window of the reported metrics in minutes (default: 5)", metavar="MINUTES")
+    parser.add_argument("--report-interval", dest="report_interval", type=float, default=10,
+                    help="in follow and listen mode, seconds between reports (default: 10)", metavar="SECONDS")
+    parser.add_argument("--reorder-window", dest="reorder_window", type=float, default=REORDER_WINDOW / 1000,
+                    help="in follow and listen mode, seconds a log may arrive after later-stamped ones and still be paired "
+                    f"in timestamp order (default: {REORDER_WINDOW // 1000})", metavar="SECONDS")
+    parser.add_argument("--cache-dir", dest="cache_dir", default=".webtracker-cache",
+                    help="directory of the columnar cache of parsed log files (default: .webtracker-cache)", metavar="DIR")
+    parser.add_argument("--rebuild-cache", dest="rebuild_cache", action="store_true",
+                    help="re-parse every log file and overwrite its cache entry")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true",
+                    help="parse the log files without reading or writing the cache")
+    parser.add_argument("-e", "--export", dest="export_dir", default=None,
+                    help="stream the user, URL, download and overlap data tables to this directory", metavar="DIR")
+    parser.add_argument("--export-format", dest="export_format", choices=["csv", "parquet"], default="csv",
+                    help="file format of the exported tables (default: csv; parquet requires pyarrow)")
+    parser.add_argument("--serve", dest="serve", action="store_true",
+                    help="serve the users, URLs, downloads, overlaps and totals pages in one Dash app")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=8050,
+                    help="port of the dashboard (default: 8050)", metavar="PORT")
+    parser.add_argument("--outputs", dest="outputs", choices=OUTPUTS, default=None, nargs='+',
+                    help="tables to export and serve; only the analysis stages they need are run (default: all)", metavar="OUTPUT")
+    parser.add_argument("--metrics", dest="metrics", choices=METRICS, default=None, nargs='+',
+                    help="metric columns to produce, besides the user and URL labels; outputs without any of them are "
+                    f"dropped (default: all). One or more of: {', '.join(METRICS)}", metavar="METRIC")
+    parser.add_argument("--profile", dest="profile", default=None,
+                    help="record wall time, CPU time, peak memory and item counts per stage and per generate_user_info step to a JSON "
+                    "report, or a cProfile stats file if FILE ends in .prof or .pstats (use -w 0 to include the per-user work)", metavar="FILE")
+    parser.add_argument("--listen", dest="listen", default=None,
+                    help="accept WebTracker beacons over HTTP on [HOST:]PORT and report live overlap metrics", metavar="[HOST:]PORT")
+    args = parser.parse_args()
+    if args.workers is not None and 0 > args.workers:
+        parser.error("--workers must be 0 or more")
+    args.plan = MetricPlan(args.outputs, args.metrics)
+    if not args.plan.outputs:
+        parser.error("none of the --metrics belong to the --outputs")
+    if args.listen:
+        return args
+    args.filenames = expand_log_paths(args.filenames)
+    if not args.filenames:
+        parser.error("no log files matched")
+    return args
 
 
 def main() -> int:
     args = handle_args()
-    logs = parse_logs(args.filename)
-    users = generate_user_logs(logs)
-    
-    totals = Totals(users)
-    totals.get_overlaps()
-    totals.get_all_urls_in_overlaps()
-    totals.get_overlapping_urls()
-
-    totals.get_avg_dload_time_per_url()
-    totals.get_num_times_dloaded_per_url()
-    totals.get_url_is_involved_in_an_overlap()
-    totals.get_url_begins_an_overlap()
-
-    totals.get_most_common_url_that_begins_an_overlap()
-    totals.get_avg_overlap_duration()
-    totals.get_avg_time_before_overlap_starts()
-    totals.get_avg_time_between_overlaps()
-    totals.get_avg_num_urls_per_overlaps()
-    
-    """
-    # user data
-    user_fields, user_rows = get_user_axes(users)
-    user_app = Dash(__name__, external_stylesheets=external_stylesheets)
-    user_data = Graph(users, user_fields, user_rows, "user_data.csv", user_app)
-    user_data.create_format1_csv()
-    user_data.get_df()
-    user_data.get_user_graphs()
-    user_data.init_app()
-
-    # unique_url data
-    url_fields, url_rows = get_url_axes(totals)
-    url_app = Dash(__name__, external_stylesheets=external_stylesheets)
-    url_data = Graph(totals, url_fields, url_rows, "unique_url_data.csv", url_app)
-    url_data.create_format2_csv()
-    url_data.get_df()
-    url_data.get_url_graphs()
-    url_data.init_app()
-
-    # download data
-    dload_fields, dload_rows = get_dload_axes(users)
-    dload_app = Dash(__name__, external_stylesheets=external_stylesheets)
-    dload_data = Graph(users, dload_fields, dload_rows, "download_data.csv", dload_app)
-    dload_data.create_format1_csv()
-    dload_data.get_df()
-    dload_data.get_dload_graphs()
-    dload_data.init_app()
-
-    # overlap data
-    overlap_fields, overlap_rows = get_overlap_axes(users)
-    overlap_app = Dash(__name__, external_stylesheets=external_stylesheets)
-    overlap_data = Graph(users, overlap_fields, overlap_rows, "overlap_data.csv", overlap_app)
-    overlap_data.create_format1_csv()
-    overlap_data.get_df()
-    overlap_data.get_overlap_graphs()
-    overlap_data.init_app()
-
-    # total overlap data
-    total_overlap_fields, total_overlap_rows = get_total_overlap_axes(totals)
-    total_overlap_app = Dash(__name__, external_stylesheets=external_stylesheets)
-    total_overlap_data = Graph(totals, total_overlap_fields, total_overlap_rows, "total_overlap_data.csv", total_overlap_app)
-    total_overlap_data.create_format3_csv()
-
-    # visualized overlaps
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        tracker = LiveTracker(int(args.window * 60000), int(args.idle_timeout * 60000), int(args.reorder_window * 1000))
+        server = BeaconServer(tracker, host or "127.0.0.1", int(port))
+        try:
+            asyncio.run(server.serve(args.report_interval, print_live_report))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.follow:
+        tracker = LiveTracker(int(args.window * 60000), int(args.idle_timeout * 60000), int(args.reorder_window * 1000))
+        follow_logs(args.filenames, tracker, args.report_interval)
+        return 0
+
+    global _USER_STEPS
+    profiler = Profiler()
+    code_profile = None
+    if args.profile:
+        if args.profile.endswith(PSTATS_EXTENSIONS):
+            code_profile = cProfile.Profile()
+            code_profile.enable()
+        else:
+            _USER_STEPS = profiler.user_steps
+
+    if args.state:
+        with profiler.stage("read_new_logs") as stage:
+            checkpoint = Checkpoint.load(args.state, int(args.idle_timeout * 60000))
+            logs = checkpoint.add_logs(read_new_logs(args.filenames, checkpoint))
+            stage["items"] = len(logs)
+        # Saved summaries are reused by later runs, which may ask for other outputs, so every stage is run.
+        users, partial = generate_user_logs(logs, args.workers, profiler)
+        with profiler.stage("save_state") as stage:
+            checkpoint.update_summaries(users)
+            checkpoint.save()
+            stage["items"] = len(users)
+        print(f"State saved to {args.state} ({checkpoint.num_open_users} open users)")
+        users, partial = checkpoint.summaries, checkpoint.get_partial_totals()
+    else:
+        cache = None if args.no_cache else LogCache(args.cache_dir, args.rebuild_cache)
+        logs = iter_log_files(args.filenames, args.workers, cache)
+        users, partial = generate_user_logs(logs, args.workers, profiler, args.plan.stages)
     
-
-    user_app.run_server(dev_tools_hot_reload=False)
-    url_app.run_server(dev_tools_hot_reload=False)
-    overlap_app.run_server(dev_tools_hot_reload=False)
-    dload_app.run_server(dev_tools_hot_reload=False)
-    """
+    with profiler.stage("totals") as stage:
+        totals = Totals.from_partials([partial])
+        totals.get_totals()
+        stage["items"] = len(totals.num_times_dloaded_per_url)
+    if args.export_dir:
+        with profiler.stage("export"):
+            export_data(users, totals, args.export_dir, args.export_format, args.plan)
+
+    if code_profile is not None:
+        code_profile.disable()
+        code_profile.dump_stats(args.profile)
+    elif args.profile:
+        profiler.save(args.profile)
+    if args.profile:
+        profiler.print_report()
+        print(f"Profile saved to {args.profile}")
+    _USER_STEPS = None
+
+    if args.serve:
+        serve_dashboard(users, totals, args.port, args.plan)
 
     return 0
 